@@ -8,10 +8,28 @@ Function-based (Q1 + Follow-ups 1–4) — HackerRank-friendly.
   F3: get_effective_permissions(role, ...)        # flatten inheritance
   F4: edge cases (unknown role, empty hierarchy, cycle, missing perms)
 
-Run: python3 solution.py
+  Performance:
+  DecisionCache(role_permissions, role_hierarchy, maxsize)  # dependency-tracked LRU decision cache
+  PermissionIndex(role_permissions, role_hierarchy)         # permission -> roles audit index
+  check_many(requests, role_permissions, role_hierarchy)    # batch of (role, permission, scope)
+  write_policy_snapshot(path, ...) / PolicySnapshot(path)   # binary snapshot, mmap load
+  set_tracer(DecisionTracer())                              # opt-in decision explain/trace
+
+Run: python3 solution.py          # tests
+     python3 solution.py --bench  # benchmarks (add --full for the 10k-role scaling suite)
 """
 
-from collections import deque
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from collections import OrderedDict, deque
 
 
 # ---------------------------------------------------------------------------
@@ -38,7 +56,11 @@ def _build_parent_map(role_hierarchy: list) -> dict:
 
 def _get_roles_with_inheritance(role: str, role_hierarchy: list) -> list:
     """Return [role] + all ancestors (BFS). Example: role=admin, hierarchy above => [admin, support, viewer]. Visited set prevents infinite loop on cycles."""
-    parent_map = _build_parent_map(role_hierarchy)
+    return _roles_from_parent_map(role, _build_parent_map(role_hierarchy))
+
+
+def _roles_from_parent_map(role: str, parent_map: dict) -> list:
+    """Same BFS as _get_roles_with_inheritance, over a prebuilt parent map (reused across many checks)."""
     result = []
     visited = set()
     q = deque([role])
@@ -66,6 +88,11 @@ def has_permission(
     because support inherits viewer and viewer has "read:charges". Unknown role => False.
     """
     roles_to_check = _get_roles_with_inheritance(role, role_hierarchy)
+    return _check_roles(roles_to_check, permission, role_permissions)
+
+
+def _check_roles(roles_to_check: list, permission: str, role_permissions: dict) -> bool:
+    """Q1 decision over an already-resolved role closure."""
     for r in roles_to_check:
         perms = role_permissions.get(r, [])
         for p in perms:
@@ -114,6 +141,9 @@ def _permission_matches_scope(perm_entry, permission: str, scope: dict) -> bool:
     return False
 
 
+_tracer = None  # DecisionTracer installed by set_tracer (see decision tracing below); None = untraced
+
+
 def has_permission_with_scope(
     role: str,
     permission: str,
@@ -125,9 +155,16 @@ def has_permission_with_scope(
     F1: Like has_permission but if a role's permission has a scope filter,
     the provided scope must match (all keys in filter must be present and equal).
     """
+    if _tracer is not None:
+        return _tracer.trace("scope", role, permission, role_permissions, role_hierarchy, scope)
+    roles_to_check = _get_roles_with_inheritance(role, role_hierarchy)
+    return _check_roles_with_scope(roles_to_check, permission, role_permissions, scope)
+
+
+def _check_roles_with_scope(roles_to_check: list, permission: str, role_permissions: dict, scope: dict = None) -> bool:
+    """F1 decision over an already-resolved role closure."""
     if scope is None:
         scope = {}
-    roles_to_check = _get_roles_with_inheritance(role, role_hierarchy)
     for r in roles_to_check:
         perms = role_permissions.get(r, [])
         for p in perms:
@@ -166,7 +203,14 @@ def has_permission_with_deny(
     F2: Permissions can be ("allow", "read:charges") or ("deny", "read:refunds").
     Deny anywhere in the chain -> False. Else allow anywhere -> True.
     """
+    if _tracer is not None:
+        return _tracer.trace("deny", role, permission, role_permissions, role_hierarchy)
     roles_to_check = _get_roles_with_inheritance(role, role_hierarchy)
+    return _check_roles_with_deny(roles_to_check, permission, role_permissions)
+
+
+def _check_roles_with_deny(roles_to_check: list, permission: str, role_permissions: dict) -> bool:
+    """F2 decision over an already-resolved role closure."""
     seen_deny = False
     seen_allow = False
     for r in roles_to_check:
@@ -331,9 +375,10 @@ def roles_with_permission(permission: str, role_permissions: dict, role_hierarch
     """
     F9: Return set of all role names that have this permission (directly or inherited).
     Example: roles_with_permission("read:charges", rp, rh) => {"viewer", "support", "admin"}
+    Roles granting it directly, plus everything that inherits from them (see PermissionIndex).
+    For repeated audit queries over the same policy, build a PermissionIndex once.
     """
-    all_roles = _all_roles(role_permissions, role_hierarchy)
-    return {r for r in all_roles if has_permission(r, permission, role_permissions, role_hierarchy)}
+    return PermissionIndex(role_permissions, role_hierarchy).roles_with_permission(permission)
 
 
 def has_any_permission_with_action(role: str, action: str, role_permissions: dict, role_hierarchy: list) -> bool:
@@ -346,6 +391,670 @@ def has_any_permission_with_action(role: str, action: str, role_permissions: dic
     return any(p.startswith(prefix) for p in effective if isinstance(p, str) and ":" in p)
 
 
+# ---------------------------------------------------------------------------
+# Performance: dependency-tracked decision cache (bounded LRU around the check functions)
+# ---------------------------------------------------------------------------
+# Example:
+#   cache = DecisionCache(role_permissions, role_hierarchy, maxsize=10_000)
+#   cache.has_permission("admin", "read:charges")   => True  (miss: closure resolved + evaluated)
+#   cache.has_permission("admin", "read:charges")   => True  (hit)
+#   cache.set_role_permissions("viewer", [])        => drops only entries whose closure contains viewer
+#   cache.add_inheritance("auditor", "viewer")      => drops only entries whose closure contains auditor
+#   cache.stats() => {"hits": 1, "misses": 1, "evictions": 0, "invalidations": 1, "size": 0, "version": 2}
+# Each entry remembers the roles it was computed from; a policy change removes just the entries that
+# depend on the changed role (no global flush) and bumps version, a counter of policy changes.
+# ---------------------------------------------------------------------------
+
+def _scope_key(scope: dict):
+    """
+    Canonical, hashable form of a scope dict. None and {} are equivalent (see has_permission_with_scope).
+    Raises TypeError if the scope has unhashable values or keys that do not sort together.
+    """
+    if not scope:
+        return None
+    key = tuple(sorted(scope.items()))
+    hash(key)
+    return key
+
+
+class DecisionCache:
+    """
+    Bounded LRU cache for has_permission / has_permission_with_deny / has_permission_with_scope,
+    bound to one (role_permissions, role_hierarchy) policy.
+
+    Mutate the policy through set_role_permissions / add_inheritance / remove_inheritance so the
+    cache can invalidate precisely. If the dict/list were changed directly, call invalidate_role(role)
+    for each changed role (or clear()).
+    """
+
+    def __init__(self, role_permissions: dict, role_hierarchy: list, maxsize: int = 100_000):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.role_permissions = role_permissions
+        self.role_hierarchy = role_hierarchy
+        self.maxsize = maxsize
+        self.version = 0
+        self._parent_map = _build_parent_map(role_hierarchy)
+        self._entries = OrderedDict()  # key -> (result, deps)
+        self._dependents = {}          # role -> set of keys whose closure includes role
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # ----- checks -----
+
+    def has_permission(self, role: str, permission: str) -> bool:
+        return self._lookup(("plain", role, permission, None), _check_roles, (permission, self.role_permissions))
+
+    def has_permission_with_deny(self, role: str, permission: str) -> bool:
+        return self._lookup(("deny", role, permission, None), _check_roles_with_deny, (permission, self.role_permissions))
+
+    def has_permission_with_scope(self, role: str, permission: str, scope: dict = None) -> bool:
+        try:
+            key = ("scope", role, permission, _scope_key(scope))
+        except TypeError:
+            # e.g. {"teams": ["t1"]}: evaluate uncached, exactly like the plain function
+            self.misses += 1
+            roles = _roles_from_parent_map(role, self._parent_map)
+            return _check_roles_with_scope(roles, permission, self.role_permissions, scope)
+        return self._lookup(key, _check_roles_with_scope, (permission, self.role_permissions, scope))
+
+    def _lookup(self, key: tuple, check, args: tuple) -> bool:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        roles = _roles_from_parent_map(key[1], self._parent_map)
+        result = check(roles, *args)
+        deps = tuple(roles)
+        self._entries[key] = (result, deps)
+        for r in deps:
+            self._dependents.setdefault(r, set()).add(key)
+        if len(self._entries) > self.maxsize:
+            old_key, old_entry = self._entries.popitem(last=False)
+            self._unlink(old_key, old_entry[1])
+            self.evictions += 1
+        return result
+
+    # ----- policy changes -----
+
+    def set_role_permissions(self, role: str, permissions: list) -> None:
+        """Replace a role's own permissions; entries whose closure contains role are dropped."""
+        self.role_permissions[role] = list(permissions)
+        self._invalidate(role)
+
+    def add_inheritance(self, child: str, parent: str) -> None:
+        """Add (child, parent) to the hierarchy; entries whose closure contains child are dropped."""
+        self.role_hierarchy.append((child, parent))
+        self._parent_map.setdefault(child, []).append(parent)
+        self._invalidate(child)
+
+    def remove_inheritance(self, child: str, parent: str) -> None:
+        """Remove one (child, parent) edge if present; entries whose closure contains child are dropped."""
+        if (child, parent) not in self.role_hierarchy:
+            return
+        self.role_hierarchy.remove((child, parent))
+        self._parent_map[child].remove(parent)
+        self._invalidate(child)
+
+    def invalidate_role(self, role: str) -> None:
+        """For policies edited in place: re-read the hierarchy, then drop every entry computed from role."""
+        self._parent_map = _build_parent_map(self.role_hierarchy)
+        self._invalidate(role)
+
+    def _invalidate(self, role: str) -> None:
+        self.version += 1
+        for key in self._dependents.pop(role, ()):
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._unlink(key, entry[1])
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """Global flush (e.g. after replacing the whole policy); counters are kept."""
+        self.version += 1
+        self._parent_map = _build_parent_map(self.role_hierarchy)
+        self._entries.clear()
+        self._dependents.clear()
+
+    def _unlink(self, key: tuple, deps: tuple) -> None:
+        for r in deps:
+            keys = self._dependents.get(r)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._dependents[r]
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "size": len(self._entries),
+            "version": self.version,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Performance: reverse permission -> roles index (audit queries)
+# ---------------------------------------------------------------------------
+# Example:
+#   index = PermissionIndex(role_permissions, role_hierarchy)
+#   index.roles_with_permission("read:charges")            => {"viewer", "support", "admin"}
+#   index.roles_with_permission_with_deny("read:refunds")  => roles allowed with no deny in their chain
+#   index.roles_with_permission_with_wildcard("read:x")    => roles granted "read:x" or "read:*"
+# Direct grants are looked up by permission string, then propagated down the child direction of
+# the hierarchy, so a query costs time proportional to the roles it returns (not R x BFS).
+# ---------------------------------------------------------------------------
+
+def _build_child_map(role_hierarchy: list) -> dict:
+    """Build role -> list of direct child roles (inverse of _build_parent_map)."""
+    child_map = {}
+    for child, parent in role_hierarchy:
+        child_map.setdefault(parent, []).append(child)
+    return child_map
+
+
+def _wildcard_keys(permission: str) -> list:
+    """Wildcard grants that match permission: "read:charges" -> ["read:*"] (see _permission_matches_wildcard)."""
+    return [permission[:i] + ":*" for i, ch in enumerate(permission) if ch == ":"]
+
+
+class PermissionIndex:
+    """
+    Reverse index over one policy: permission -> roles that grant (or deny) it directly.
+    Answers match roles_with_permission and the per-role has_permission_with_deny /
+    has_permission_with_wildcard checks. Keep it current with set_role_permissions /
+    add_inheritance / remove_inheritance.
+    """
+
+    def __init__(self, role_permissions: dict, role_hierarchy: list):
+        self.role_permissions = role_permissions
+        self.role_hierarchy = role_hierarchy
+        self._child_map = _build_child_map(role_hierarchy)
+        self._plain = {}  # "read:charges" / "read:*" -> roles with that plain string entry
+        self._allow = {}  # permission -> roles allowing it under F2 rules (string, ("allow", p), (p,))
+        self._deny = {}   # permission -> roles with ("deny", p)
+        for role, perms in role_permissions.items():
+            self._index_role(role, perms)
+
+    def _index_role(self, role: str, perms: list) -> None:
+        for p in perms:
+            for table, perm in self._entries_for(p):
+                table.setdefault(perm, set()).add(role)
+
+    def _unindex_role(self, role: str, perms: list) -> None:
+        for p in perms:
+            for table, perm in self._entries_for(p):
+                roles = table.get(perm)
+                if roles is not None:
+                    roles.discard(role)
+                    if not roles:
+                        del table[perm]
+
+    def _entries_for(self, p) -> list:
+        """Index tables a single permission entry belongs to (mirrors the checks' parsing rules)."""
+        if isinstance(p, str):
+            return [(self._plain, p), (self._allow, p)]
+        if isinstance(p, tuple):
+            out = []
+            if len(p) >= 2 and p[0] == "deny":
+                out.append((self._deny, p[1]))
+            if len(p) >= 2 and p[0] == "allow":
+                out.append((self._allow, p[1]))
+            if len(p) == 1:
+                out.append((self._allow, p[0]))
+            return out
+        return []
+
+    def _descendants(self, roots) -> set:
+        """roots plus every role that inherits from one of them (BFS over the child map)."""
+        result = set()
+        q = deque(roots)
+        while q:
+            r = q.popleft()
+            if r in result:
+                continue
+            result.add(r)
+            for child in self._child_map.get(r, []):
+                if child not in result:
+                    q.append(child)
+        return result
+
+    def roles_with_permission(self, permission: str) -> set:
+        """Same answer as roles_with_permission (Q1 rule: exact plain-string grants)."""
+        return self._descendants(self._plain.get(permission, ()))
+
+    def roles_with_permission_with_deny(self, permission: str) -> set:
+        """Roles r with has_permission_with_deny(r, permission) True: allowed somewhere, denied nowhere."""
+        allowed = self._descendants(self._allow.get(permission, ()))
+        if permission not in self._deny:
+            return allowed
+        return allowed - self._descendants(self._deny[permission])
+
+    def roles_with_permission_with_wildcard(self, permission: str) -> set:
+        """Roles r with has_permission_with_wildcard(r, permission) True (exact or "action:*" grant)."""
+        roots = set(self._plain.get(permission, ()))
+        for key in _wildcard_keys(permission):
+            roots.update(self._plain.get(key, ()))
+        return self._descendants(roots)
+
+    def set_role_permissions(self, role: str, permissions: list) -> None:
+        self._unindex_role(role, self.role_permissions.get(role, []))
+        self.role_permissions[role] = list(permissions)
+        self._index_role(role, self.role_permissions[role])
+
+    def add_inheritance(self, child: str, parent: str) -> None:
+        self.role_hierarchy.append((child, parent))
+        self._child_map.setdefault(parent, []).append(child)
+
+    def remove_inheritance(self, child: str, parent: str) -> None:
+        if (child, parent) not in self.role_hierarchy:
+            return
+        self.role_hierarchy.remove((child, parent))
+        self._child_map[parent].remove(child)
+
+
+# ---------------------------------------------------------------------------
+# Performance: batch checks for list endpoints
+# ---------------------------------------------------------------------------
+# Example:
+#   check_many([("support", "read:charges", {"team_id": "team_123"}),
+#               ("support", "read:charges", {"team_id": "other"}),
+#               ("viewer", "read:charges", None)], role_permissions_scoped, [])
+#   => [True, False, True]
+# The batch is grouped by role; each role's closure is resolved once from one parent map.
+# ---------------------------------------------------------------------------
+
+def check_many(requests: list, role_permissions: dict, role_hierarchy: list) -> list:
+    """
+    Batch has_permission_with_scope: requests are (role, permission, scope) or (role, permission).
+    Return one bool per request, in input order.
+    """
+    parent_map = _build_parent_map(role_hierarchy)
+    by_role = {}
+    for i, req in enumerate(requests):
+        by_role.setdefault(req[0], []).append(i)
+    results = [False] * len(requests)
+    for role, positions in by_role.items():
+        roles_to_check = _roles_from_parent_map(role, parent_map)
+        for i in positions:
+            req = requests[i]
+            scope = req[2] if len(req) > 2 else None
+            results[i] = _check_roles_with_scope(roles_to_check, req[1], role_permissions, scope)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Performance: compact binary policy snapshot (fast cold start, mmap-shared pages)
+# ---------------------------------------------------------------------------
+# Example:
+#   write_policy_snapshot("policy.acps", role_permissions, role_hierarchy)   # once, at build/deploy time
+#   snap = PolicySnapshot("policy.acps")                                      # per worker: mmap, no parsing
+#   snap.has_permission("admin", "read:charges")         => True
+#   snap.has_permission_with_deny("support", "read:refunds")
+#   snap.has_permission_with_scope("support", "read:charges", {"team_id": "team_123"})
+#   snap.to_policy()  => (role_permissions, role_hierarchy)  # plain form, same as the input
+#
+# Layout (native-endian uint32 arrays, every section 4-byte aligned):
+#   header | string offsets | string blob (sorted, interned) | per-role entry offsets | entries
+#   | scope pairs | per-role closure offsets | closures (BFS order) | per-permission posting offsets
+#   | postings (entry ids) | hierarchy edges | role_permissions keys
+# Roles and permissions are string ids; the string table is sorted so a name is found by binary
+# search straight from the mapped pages. Closures are precomputed, so checks do no BFS: a check
+# looks at the entries posted under the permission and keeps those owned by a role in the closure.
+# Scope keys and values must be strings; a None scope loads back as {} (same meaning to the checks).
+# ---------------------------------------------------------------------------
+
+_SNAPSHOT_MAGIC = b"ACPS"
+_SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct("<4sHBx8I")  # magic, version, big-endian flag, section counts
+_ENTRY_STR, _ENTRY_ONE, _ENTRY_PAIR, _ENTRY_SCOPED = 0, 1, 2, 3
+_ENTRY_FIELDS = 6  # kind, owner role, a, b, scope_start, scope_len
+
+
+def _encode_entry(p, role: int, sid: dict, pairs: list) -> tuple:
+    """One permission entry -> (kind, role, a, b, scope_start, scope_len). Mirrors the forms the checks accept."""
+    if isinstance(p, str):
+        return (_ENTRY_STR, role, sid[p], 0, 0, 0)
+    if isinstance(p, tuple) and len(p) == 1 and isinstance(p[0], str):
+        return (_ENTRY_ONE, role, sid[p[0]], 0, 0, 0)
+    if isinstance(p, tuple) and len(p) == 2 and isinstance(p[0], str):
+        if isinstance(p[1], str):
+            return (_ENTRY_PAIR, role, sid[p[0]], sid[p[1]], 0, 0)
+        if p[1] is None or isinstance(p[1], dict):
+            start = len(pairs)
+            for k, v in (p[1] or {}).items():
+                pairs.append((sid[k], sid[v]))
+            return (_ENTRY_SCOPED, role, sid[p[0]], 0, start, len(pairs) - start)
+    raise ValueError(f"unsupported permission entry for snapshot: {p!r}")
+
+
+def _snapshot_strings(role_permissions: dict, role_hierarchy: list) -> list:
+    strings = _all_roles(role_permissions, role_hierarchy)
+    for perms in role_permissions.values():
+        for p in perms:
+            for part in (p if isinstance(p, tuple) else (p,)):
+                if isinstance(part, str):
+                    strings.add(part)
+                elif isinstance(part, dict):
+                    for k, v in part.items():
+                        if not isinstance(k, str) or not isinstance(v, str):
+                            raise ValueError(f"snapshot scope keys/values must be strings: {part!r}")
+                        strings.update((k, v))
+    return sorted(strings, key=lambda s: s.encode("utf-8"))
+
+
+def write_policy_snapshot(path: str, role_permissions: dict, role_hierarchy: list) -> int:
+    """Serialize the policy plus every role's precomputed closure. Return the file size in bytes."""
+    strings = _snapshot_strings(role_permissions, role_hierarchy)
+    sid = {s: i for i, s in enumerate(strings)}
+    encoded = [s.encode("utf-8") for s in strings]
+    str_offsets = array("I", [0])
+    for b in encoded:
+        str_offsets.append(str_offsets[-1] + len(b))
+    blob = b"".join(encoded)
+
+    perm_offsets, entries, pairs = array("I", [0]), array("I"), []
+    closure_offsets, closures = array("I", [0]), array("I")
+    posted = {}  # permission sid -> entry ids (allow/deny pairs are posted under their permission)
+    parent_map = _build_parent_map(role_hierarchy)
+    roles = _all_roles(role_permissions, role_hierarchy)
+    for i, s in enumerate(strings):
+        for p in role_permissions.get(s, []):
+            entry = _encode_entry(p, i, sid, pairs)
+            posted.setdefault(entry[3] if entry[0] == _ENTRY_PAIR else entry[2], []).append(len(entries) // _ENTRY_FIELDS)
+            entries.extend(entry)
+        perm_offsets.append(len(entries) // _ENTRY_FIELDS)
+        if s in roles:
+            closures.extend(sid[r] for r in _roles_from_parent_map(s, parent_map))
+        closure_offsets.append(len(closures))
+    posting_offsets, postings = array("I", [0]), array("I")
+    for i in range(len(strings)):
+        postings.extend(posted.get(i, ()))
+        posting_offsets.append(len(postings))
+    scope_pairs = array("I", [x for pair in pairs for x in pair])
+    edges = array("I", [sid[x] for edge in role_hierarchy for x in edge])
+    keys = array("I", [sid[r] for r in role_permissions])
+
+    header = _SNAPSHOT_HEADER.pack(
+        _SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, sys.byteorder == "big", len(strings), len(blob),
+        len(entries) // _ENTRY_FIELDS, len(pairs), len(closures), len(postings), len(role_hierarchy), len(keys),
+    )
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(str_offsets.tobytes())
+        f.write(blob + b"\0" * (-len(blob) % 4))
+        for section in (perm_offsets, entries, scope_pairs, closure_offsets, closures,
+                        posting_offsets, postings, edges, keys):
+            f.write(section.tobytes())
+        return f.tell()
+
+
+class PolicySnapshot:
+    """
+    Read-only policy loaded from write_policy_snapshot output via mmap. Sections are memoryview
+    casts over the mapping (no copies), so workers mapping the same file share its pages.
+    Checks give the same answers as has_permission / has_permission_with_deny / has_permission_with_scope.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, big_endian, n, blob_len, n_entries, n_pairs, n_closure, n_postings, n_edges, n_keys = \
+            _SNAPSHOT_HEADER.unpack_from(self._mm, 0)
+        if magic != _SNAPSHOT_MAGIC:
+            raise ValueError("not a policy snapshot")
+        if version != _SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version: {version}")
+        if bool(big_endian) != (sys.byteorder == "big"):
+            raise ValueError("snapshot was written on a machine with different byte order")
+        self._mv = mv = memoryview(self._mm)
+        pos = _SNAPSHOT_HEADER.size
+
+        def take(count: int):
+            nonlocal pos
+            section = mv[pos:pos + 4 * count].cast("I")
+            pos += 4 * count
+            return section
+
+        self._str_offsets = take(n + 1)
+        self._blob_start = pos
+        pos += blob_len + (-blob_len % 4)
+        self._perm_offsets = take(n + 1)
+        self._entries = take(n_entries * _ENTRY_FIELDS)
+        self._scope_pairs = take(n_pairs * 2)
+        self._closure_offsets = take(n + 1)
+        self._closures = take(n_closure)
+        self._posting_offsets = take(n + 1)
+        self._postings = take(n_postings)
+        self._edges = take(n_edges * 2)
+        self._keys = take(n_keys)
+        self._n = n
+        self._allow = self._sid("allow")
+        self._deny = self._sid("deny")
+
+    def _string(self, i: int) -> str:
+        start = self._blob_start
+        return self._mm[start + self._str_offsets[i]:start + self._str_offsets[i + 1]].decode("utf-8")
+
+    def _sid(self, s: str) -> int:
+        """String id by binary search over the sorted table, or -1 if s is not interned."""
+        target = s.encode("utf-8")
+        start, offsets, mm = self._blob_start, self._str_offsets, self._mm
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            cur = mm[start + offsets[mid]:start + offsets[mid + 1]]
+            if cur < target:
+                lo = mid + 1
+            elif cur > target:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def _closure(self, r: int):
+        return self._closures[self._closure_offsets[r]:self._closure_offsets[r + 1]]
+
+    def _candidates(self, role: str, permission: str) -> list:
+        """Entries posted under permission whose owner is in role's closure, in evaluation order
+        (closure BFS order, then the owner's own entry order), as (kind, a, scope_start, scope_len)."""
+        p, r = self._sid(permission), self._sid(role)
+        if p < 0 or r < 0 or self._posting_offsets[p] == self._posting_offsets[p + 1]:
+            return []
+        closure = self._closure(r)
+        rank = dict(zip(closure, range(len(closure))))
+        entries, k = self._entries, _ENTRY_FIELDS
+        found = []
+        for e in self._postings[self._posting_offsets[p]:self._posting_offsets[p + 1]]:
+            pos = rank.get(entries[e * k + 1])
+            if pos is not None:
+                found.append((pos, e))
+        found.sort()
+        return [(entries[e * k], entries[e * k + 2], entries[e * k + 4], entries[e * k + 5]) for _, e in found]
+
+    def roles_with_inheritance(self, role: str) -> list:
+        """Precomputed _get_roles_with_inheritance(role, ...) from the snapshot."""
+        r = self._sid(role)
+        if r < 0 or self._closure_offsets[r] == self._closure_offsets[r + 1]:
+            return [role]
+        return [self._string(c) for c in self._closure(r)]
+
+    def has_permission(self, role: str, permission: str) -> bool:
+        return any(kind == _ENTRY_STR for kind, _, _, _ in self._candidates(role, permission))
+
+    def has_permission_with_deny(self, role: str, permission: str) -> bool:
+        seen_allow = False
+        for kind, a, _, _ in self._candidates(role, permission):
+            if kind == _ENTRY_PAIR:
+                if a == self._deny:
+                    return False
+                if a == self._allow:
+                    seen_allow = True
+            elif kind in (_ENTRY_STR, _ENTRY_ONE):
+                seen_allow = True
+        return seen_allow
+
+    def has_permission_with_scope(self, role: str, permission: str, scope: dict = None) -> bool:
+        scope = scope or {}
+        pairs = self._scope_pairs
+        for kind, a, start, length in self._candidates(role, permission):
+            if kind == _ENTRY_PAIR:
+                if a == self._deny:
+                    return False
+                continue
+            if kind in (_ENTRY_STR, _ENTRY_ONE):
+                return True
+            if all(scope.get(self._string(pairs[2 * i])) == self._string(pairs[2 * i + 1])
+                   for i in range(start, start + length)):
+                return True
+        return False
+
+    def _decode_entry(self, kind: int, role: int, a: int, b: int, start: int, length: int):
+        if kind == _ENTRY_STR:
+            return self._string(a)
+        if kind == _ENTRY_ONE:
+            return (self._string(a),)
+        if kind == _ENTRY_PAIR:
+            return (self._string(a), self._string(b))
+        pairs = self._scope_pairs
+        return (self._string(a), {self._string(pairs[2 * i]): self._string(pairs[2 * i + 1])
+                                  for i in range(start, start + length)})
+
+    def to_policy(self) -> tuple:
+        """Rebuild (role_permissions, role_hierarchy) in the plain in-memory form."""
+        role_permissions = {}
+        entries, k = self._entries, _ENTRY_FIELDS
+        for s in self._keys:
+            lo, hi = self._perm_offsets[s], self._perm_offsets[s + 1]
+            role_permissions[self._string(s)] = [
+                self._decode_entry(*entries[e * k:(e + 1) * k]) for e in range(lo, hi)]
+        edges = self._edges
+        role_hierarchy = [(self._string(edges[i]), self._string(edges[i + 1])) for i in range(0, len(edges), 2)]
+        return role_permissions, role_hierarchy
+
+    def close(self) -> None:
+        for section in (self._str_offsets, self._perm_offsets, self._entries, self._scope_pairs,
+                        self._closure_offsets, self._closures, self._posting_offsets, self._postings,
+                        self._edges, self._keys, self._mv):
+            section.release()
+        self._mm.close()
+
+
+# ---------------------------------------------------------------------------
+# Performance: opt-in decision tracing for has_permission_with_deny / has_permission_with_scope
+# ---------------------------------------------------------------------------
+# Example:
+#   tracer = DecisionTracer(max_records=1000)
+#   set_tracer(tracer)
+#   has_permission_with_deny("support", "read:refunds", role_permissions_deny, role_hierarchy_2)  => False
+#   tracer.records[-1] => {"check": "deny", "role": "support", "permission": "read:refunds", "scope": None,
+#                          "result": False, "reason": "denied", "roles_visited": ["support", "viewer"],
+#                          "matched": ("support", ("deny", "read:refunds")),
+#                          "traversal_seconds": ..., "eval_seconds": ...}
+#   tracer.counters["read:refunds"] => {"calls": 1, "allowed": 0, "denied": 1, "scope_mismatch": 0,
+#                                       "no_grant": 0, "seconds": ...}
+#   set_tracer(None)   # off again: the checks pay one global lookup
+# Reasons: "allowed", "denied" (deny entry), "scope_mismatch" (grant exists, scope did not match),
+# "no_grant" (nothing in the chain mentions the permission).
+# ---------------------------------------------------------------------------
+
+def set_tracer(tracer):
+    """Install a DecisionTracer (or None to disable). Return the previous one."""
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    return previous
+
+
+def _explain_deny(roles_to_check: list, permission: str, role_permissions: dict) -> tuple:
+    """_check_roles_with_deny, also returning (reason, roles_visited, matched (role, entry) or None)."""
+    deny_match = allow_match = None
+    for r in roles_to_check:
+        for p in role_permissions.get(r, []):
+            if isinstance(p, tuple):
+                if len(p) >= 2 and p[0] == "deny" and p[1] == permission and deny_match is None:
+                    deny_match = (r, p)
+                if len(p) >= 2 and p[0] == "allow" and p[1] == permission and allow_match is None:
+                    allow_match = (r, p)
+                if len(p) == 1 and p[0] == permission and allow_match is None:
+                    allow_match = (r, p)
+            elif p == permission and allow_match is None:
+                allow_match = (r, p)
+    if deny_match is not None:
+        return False, "denied", list(roles_to_check), deny_match
+    if allow_match is not None:
+        return True, "allowed", list(roles_to_check), allow_match
+    return False, "no_grant", list(roles_to_check), None
+
+
+def _explain_scope(roles_to_check: list, permission: str, role_permissions: dict, scope: dict = None) -> tuple:
+    """_check_roles_with_scope, also returning (reason, roles_visited, matched (role, entry) or None)."""
+    if scope is None:
+        scope = {}
+    visited = []
+    mismatch = None
+    for r in roles_to_check:
+        visited.append(r)
+        for p in role_permissions.get(r, []):
+            if isinstance(p, tuple) and len(p) >= 2 and p[0] == "deny":
+                if p[1] == permission:
+                    return False, "denied", visited, (r, p)
+                continue
+            if _permission_matches_scope(p, permission, scope):
+                return True, "allowed", visited, (r, p)
+            if isinstance(p, str) and p == permission:
+                return True, "allowed", visited, (r, p)
+            if isinstance(p, tuple) and len(p) == 2 and p[0] == permission and mismatch is None:
+                mismatch = (r, p)
+    if mismatch is not None:
+        return False, "scope_mismatch", visited, mismatch
+    return False, "no_grant", visited, None
+
+
+class DecisionTracer:
+    """Collects decision records (bounded) and per-permission counters while installed via set_tracer."""
+
+    def __init__(self, max_records: int = 1000):
+        self.records = deque(maxlen=max_records)
+        self.counters = {}
+
+    def trace(self, check: str, role: str, permission: str, role_permissions: dict, role_hierarchy: list,
+              scope: dict = None) -> bool:
+        start = time.perf_counter()
+        roles_to_check = _get_roles_with_inheritance(role, role_hierarchy)
+        traversed = time.perf_counter()
+        if check == "deny":
+            result, reason, visited, matched = _explain_deny(roles_to_check, permission, role_permissions)
+        else:
+            result, reason, visited, matched = _explain_scope(roles_to_check, permission, role_permissions, scope)
+        end = time.perf_counter()
+        self.records.append({
+            "check": check,
+            "role": role,
+            "permission": permission,
+            "scope": scope,
+            "result": result,
+            "reason": reason,
+            "roles_visited": visited,
+            "matched": matched,
+            "traversal_seconds": traversed - start,
+            "eval_seconds": end - traversed,
+        })
+        c = self.counters.get(permission)
+        if c is None:
+            c = self.counters[permission] = {"calls": 0, "allowed": 0, "denied": 0, "scope_mismatch": 0,
+                                             "no_grant": 0, "seconds": 0.0}
+        c["calls"] += 1
+        c[reason] += 1
+        c["seconds"] += end - start
+        return result
+
+
 def run_tests():
     # ----- Q1: Basic hierarchy -----
     role_permissions = {
@@ -426,8 +1135,361 @@ def run_tests():
     assert has_any_permission_with_action("support", "read", role_permissions, role_hierarchy) is True
     assert has_any_permission_with_action("viewer", "write", role_permissions, role_hierarchy) is False
 
+    # ----- Decision cache -----
+    rp_c = {k: list(v) for k, v in role_permissions.items()}
+    rh_c = list(role_hierarchy)
+    cache = DecisionCache(rp_c, rh_c, maxsize=3)
+    assert cache.has_permission("admin", "read:charges") is True
+    assert cache.has_permission("admin", "read:charges") is True
+    assert cache.has_permission_with_scope("support", "read:charges", {}) is True
+    assert cache.has_permission_with_scope("support", "read:charges", None) is True  # same canonical key
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+    assert cache.has_permission_with_deny("viewer", "write:charges") is False
+    cache.set_role_permissions("admin", ["write:charges"])  # viewer/support entries survive
+    assert cache.stats()["size"] == 2 and cache.stats()["invalidations"] == 1
+    cache.set_role_permissions("viewer", [])  # every cached closure contains viewer
+    assert cache.stats()["size"] == 0
+    assert cache.has_permission("admin", "read:charges") is False
+    cache.add_inheritance("admin", "billing")
+    cache.set_role_permissions("billing", ["read:charges"])
+    assert cache.has_permission("admin", "read:charges") is True
+    cache.remove_inheritance("admin", "billing")
+    assert cache.has_permission("admin", "read:charges") is False
+    for i in range(5):
+        cache.has_permission("admin", f"p{i}")
+    assert cache.stats()["size"] == 3 and cache.stats()["evictions"] >= 2
+    rp_list = {"support": [("read:charges", {"teams": ["t1"]})]}
+    list_cache = DecisionCache(rp_list, [])
+    for scope in ({"teams": ["t1"]}, {"teams": ["t2"]}, {1: "a", "teams": ["t1"]}):
+        expected = has_permission_with_scope("support", "read:charges", rp_list, [], scope)
+        assert list_cache.has_permission_with_scope("support", "read:charges", scope) is expected
+    assert list_cache.stats()["size"] == 0  # unhashable / unsortable scopes are evaluated uncached
+
+    # ----- Permission index (reverse lookups) -----
+    index = PermissionIndex(role_permissions, role_hierarchy)
+    assert index.roles_with_permission("read:charges") == {"viewer", "support", "admin"}
+    assert index.roles_with_permission("nope") == set()
+    idx_deny = PermissionIndex(role_permissions_deny, role_hierarchy_2)
+    assert idx_deny.roles_with_permission_with_deny("read:refunds") == {"viewer"}
+    assert idx_deny.roles_with_permission_with_deny("read:charges") == {"viewer", "support"}
+    rp_mix = {"viewer": ["read:*"], "support": ["read:charges:team:*"], "admin": [("deny", "read:refunds")]}
+    idx_mix = PermissionIndex(rp_mix, role_hierarchy)
+    for perm in ["read:charges", "read:charges:team:1", "write:charges", "read:refunds"]:
+        all_r = _all_roles(rp_mix, role_hierarchy)
+        assert idx_mix.roles_with_permission_with_wildcard(perm) == {
+            r for r in all_r if has_permission_with_wildcard(r, perm, rp_mix, role_hierarchy)}
+        assert idx_mix.roles_with_permission_with_deny(perm) == {
+            r for r in all_r if has_permission_with_deny(r, perm, rp_mix, role_hierarchy)}
+    assert roles_with_permission("a:x", {"a": ["a:x"]}, cycle_hierarchy) == {"a", "b"}
+    idx_live = PermissionIndex({"viewer": ["read:charges"]}, [])
+    idx_live.add_inheritance("admin", "viewer")
+    assert idx_live.roles_with_permission("read:charges") == {"viewer", "admin"}
+    idx_live.set_role_permissions("viewer", [])
+    assert idx_live.roles_with_permission("read:charges") == set()
+
+    # ----- Batch checks -----
+    batch = [
+        ("support", "read:charges", {"team_id": "team_123"}),
+        ("viewer", "read:charges", None),
+        ("support", "read:charges", {"team_id": "other"}),
+        ("unknown", "read:charges"),
+    ]
+    assert check_many(batch, role_permissions_scoped, []) == [True, True, False, False]
+    assert check_many([], role_permissions, role_hierarchy) == []
+    batch2 = [(r, p, None) for r in ["admin", "viewer", "support"] for p in ["read:charges", "write:charges"]]
+    assert check_many(batch2, role_permissions, role_hierarchy) == [
+        has_permission_with_scope(r, p, role_permissions, role_hierarchy, s) for r, p, s in batch2]
+
+    # ----- Benchmark generators: seeded and well-formed -----
+    for shape in _BENCH_SHAPES:
+        rp_gen, rh_gen = generate_policy(shape, n_roles=60, n_perms=300, depth=6, seed=7)
+        assert (rp_gen, rh_gen) == generate_policy(shape, n_roles=60, n_perms=300, depth=6, seed=7)
+        assert sum(len(v) for v in rp_gen.values()) == 300
+        qs = generate_queries(rp_gen, 50, seed=7)
+        assert check_many(qs, rp_gen, rh_gen) == [has_permission_with_scope(r, p, rp_gen, rh_gen, s) for r, p, s in qs]
+    _, rh_cyc = generate_policy("cycles", n_roles=60, n_perms=10, depth=6, seed=7)
+    assert any(int(c[4:]) < int(p[4:]) for c, p in rh_cyc)  # has at least one back-edge
+    assert _percentile([1, 2, 3, 4], 50) == 2 and _percentile([1, 2, 3, 4], 99) == 4
+
+    # ----- Binary policy snapshot -----
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "policy.acps")
+        rp_snap = {**role_permissions_scoped, **role_permissions_deny, "empty": [],
+                   "auditor": [("allow", "read:charges"), ("export:all",), ("read:disputes", None)]}
+        rh_snap = role_hierarchy_2 + [("auditor", "support"), ("a", "b"), ("b", "a")]
+        write_policy_snapshot(path, rp_snap, rh_snap)
+        snap = PolicySnapshot(path)
+        rp_loaded, rh_loaded = snap.to_policy()
+        assert rh_loaded == rh_snap and rp_loaded["auditor"][-1] == ("read:disputes", {})
+        assert {**rp_loaded, "auditor": rp_snap["auditor"][:-1]} == {**rp_snap, "auditor": rp_snap["auditor"][:-1]}
+        assert snap.roles_with_inheritance("auditor") == _get_roles_with_inheritance("auditor", rh_snap)
+        assert snap.roles_with_inheritance("nobody") == ["nobody"]
+        scopes = [None, {}, {"team_id": "team_123"}, {"team_id": "other"}]
+        for r in ["viewer", "support", "auditor", "empty", "a", "nobody"]:
+            for perm in ["read:charges", "read:refunds", "write:customers", "export:all", "read:disputes", "x"]:
+                assert snap.has_permission(r, perm) == has_permission(r, perm, rp_snap, rh_snap)
+                assert snap.has_permission_with_deny(r, perm) == has_permission_with_deny(r, perm, rp_snap, rh_snap)
+                for sc in scopes:
+                    assert snap.has_permission_with_scope(r, perm, sc) == \
+                        has_permission_with_scope(r, perm, rp_snap, rh_snap, sc)
+        snap.close()
+        with open(path, "r+b") as f:
+            f.write(b"XXXX")
+        try:
+            PolicySnapshot(path)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+        try:
+            write_policy_snapshot(path, {"r": [("read:x", {"team_id": 1})]}, [])
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+
+    # ----- Decision tracing -----
+    tracer = DecisionTracer(max_records=2)
+    assert set_tracer(tracer) is None
+    try:
+        assert has_permission_with_deny("support", "read:refunds", role_permissions_deny, role_hierarchy_2) is False
+        rec = tracer.records[-1]
+        assert rec["reason"] == "denied" and rec["roles_visited"] == ["support", "viewer"]
+        assert rec["matched"] == ("support", ("deny", "read:refunds"))
+        assert has_permission_with_scope("support", "read:charges", role_permissions_scoped, [], {"team_id": "x"}) is False
+        rec = tracer.records[-1]
+        assert rec["reason"] == "scope_mismatch" and rec["matched"] == ("support", ("read:charges", {"team_id": "team_123"}))
+        assert has_permission_with_scope("viewer", "read:charges", role_permissions_scoped, []) is True
+        assert tracer.records[-1]["reason"] == "allowed" and len(tracer.records) == 2
+        assert has_permission_with_deny("viewer", "nope", role_permissions_deny, role_hierarchy_2) is False
+        assert tracer.counters["read:charges"]["calls"] == 2 and tracer.counters["read:charges"]["allowed"] == 1
+        assert tracer.counters["nope"]["no_grant"] == 1
+        # traced answers match untraced ones
+        for r, perm, sc in generate_queries(rp_gen, 50, seed=3):
+            traced = (has_permission_with_deny(r, perm, rp_gen, rh_gen), has_permission_with_scope(r, perm, rp_gen, rh_gen, sc))
+            roles_gen = _get_roles_with_inheritance(r, rh_gen)
+            assert traced == (_check_roles_with_deny(roles_gen, perm, rp_gen),
+                              _check_roles_with_scope(roles_gen, perm, rp_gen, sc))
+    finally:
+        assert set_tracer(None) is tracer
+
     print("All tests passed.")
 
 
+# ---------------------------------------------------------------------------
+# Benchmarks: seeded synthetic policies + scaling suite (python3 solution.py --bench [--full])
+# ---------------------------------------------------------------------------
+# Shapes:
+#   deep_chain  — chains `depth` roles deep, with occasional cross-links (DAG)
+#   wide_fan_in — `depth` levels, each role inherits 5–20 roles of the level below
+#   cycles      — deep_chain plus back-edges (ancestor inherits descendant)
+#   heavy_deny  — deep_chain with ~30% of entries being ("deny", perm)
+# Every shape mixes plain, ("allow", p), scoped (p, {"team_id": ...}) and "action:*" entries.
+# Same seed => same policy and query stream, so runs are comparable across commits.
+# ---------------------------------------------------------------------------
+
+_BENCH_ACTIONS = ["read", "write", "delete", "refund", "export"]
+_BENCH_SHAPES = ("deep_chain", "wide_fan_in", "cycles", "heavy_deny")
+
+
+def generate_policy(shape: str, n_roles: int = 1000, n_perms: int = 10_000, depth: int = 20, seed: int = 0) -> tuple:
+    """Return (role_permissions, role_hierarchy) for one benchmark shape. n_perms = total permission entries."""
+    if shape not in _BENCH_SHAPES:
+        raise ValueError(f"unknown shape: {shape}")
+    rng = random.Random(seed)
+    roles = [f"role{i}" for i in range(n_roles)]
+    resources = [f"res{i}" for i in range(max(1, n_perms // 10))]
+    role_hierarchy = []
+    if shape == "wide_fan_in":
+        level_size = max(1, n_roles // depth)
+        for i in range(level_size, n_roles):
+            level_start = (i // level_size - 1) * level_size
+            below = roles[level_start:level_start + level_size]
+            for parent in rng.sample(below, min(len(below), rng.randint(5, 20))):
+                role_hierarchy.append((roles[i], parent))
+    else:
+        for i in range(n_roles):
+            chain_start = i - i % depth
+            if i % depth:
+                role_hierarchy.append((roles[i], roles[i - 1]))
+            if chain_start and rng.random() < 0.1:
+                role_hierarchy.append((roles[i], roles[rng.randrange(chain_start)]))
+            if shape == "cycles" and i % depth and rng.random() < 0.05:
+                role_hierarchy.append((roles[rng.randrange(chain_start, i)], roles[i]))
+
+    deny_ratio = 0.3 if shape == "heavy_deny" else 0.03
+    role_permissions = {r: [] for r in roles}
+    for _ in range(n_perms):
+        action = rng.choice(_BENCH_ACTIONS)
+        perm = f"{action}:{rng.choice(resources)}"
+        x = rng.random()
+        if x < deny_ratio:
+            entry = ("deny", perm)
+        elif x < deny_ratio + 0.02:
+            entry = f"{action}:*"
+        elif x < deny_ratio + 0.17:
+            entry = (perm, {"team_id": f"team_{rng.randrange(50)}"})
+        elif x < deny_ratio + 0.22:
+            entry = ("allow", perm)
+        else:
+            entry = perm
+        role_permissions[rng.choice(roles)].append(entry)
+    return role_permissions, role_hierarchy
+
+
+def generate_queries(role_permissions: dict, n: int, seed: int = 0) -> list:
+    """(role, permission, scope) stream: ~80% permissions present in the policy, half of them scoped."""
+    rng = random.Random(seed + 1)
+    roles = sorted(role_permissions)
+    known = []
+    for perms in role_permissions.values():
+        for p in perms:
+            if isinstance(p, str):
+                known.append(p)
+            elif isinstance(p, tuple) and len(p) >= 2:
+                known.append(p[1] if p[0] in ("allow", "deny") else p[0])
+    known = [p for p in known if not p.endswith(":*")] or ["read:res0"]
+    queries = []
+    for i in range(n):
+        perm = rng.choice(known) if rng.random() < 0.8 else f"{rng.choice(_BENCH_ACTIONS)}:missing{i}"
+        scope = {"team_id": f"team_{rng.randrange(50)}"} if rng.random() < 0.5 else None
+        queries.append((rng.choice(roles), perm, scope))
+    return queries
+
+
+def _percentile(sorted_samples: list, pct: float) -> float:
+    """Nearest-rank percentile of an already-sorted list."""
+    idx = max(0, min(len(sorted_samples) - 1, int(round(pct / 100 * len(sorted_samples))) - 1))
+    return sorted_samples[idx]
+
+
+def _latencies(fn, queries: list) -> list:
+    out = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        out.append(time.perf_counter() - start)
+    out.sort()
+    return out
+
+
+def _peak_memory(fn, queries: list) -> int:
+    """Peak bytes allocated by tracemalloc while running fn over queries."""
+    tracemalloc.start()
+    try:
+        for q in queries:
+            fn(q)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _suite_cases(rp: dict, rh: list) -> list:
+    """(name, fn(query), expensive) for every public check function; expensive cases get fewer samples."""
+    cache = DecisionCache(rp, rh, maxsize=10_000)
+    index = PermissionIndex(rp, rh)
+    return [
+        ("has_permission", lambda q: has_permission(q[0], q[1], rp, rh), False),
+        ("has_permission_with_scope", lambda q: has_permission_with_scope(q[0], q[1], rp, rh, q[2]), False),
+        ("has_permission_with_deny", lambda q: has_permission_with_deny(q[0], q[1], rp, rh), False),
+        ("has_permission_with_wildcard", lambda q: has_permission_with_wildcard(q[0], q[1], rp, rh), False),
+        ("get_effective_permissions", lambda q: get_effective_permissions(q[0], rp, rh), False),
+        ("list_permissions_for_role", lambda q: list_permissions_for_role(q[0], rp, rh, action_filter="read"), False),
+        ("has_all_permissions[3]", lambda q: has_all_permissions(q[0], [q[1], "read:res0", "write:res1"], rp, rh), False),
+        ("has_any_permission_with_action", lambda q: has_any_permission_with_action(q[0], q[1].split(":")[0], rp, rh), False),
+        ("roles_with_permission", lambda q: roles_with_permission(q[1], rp, rh), True),
+        ("check_many[100]", lambda q: check_many([(q[0], f"read:res{i}", q[2]) for i in range(100)], rp, rh), True),
+        ("DecisionCache.has_permission_with_scope", lambda q: cache.has_permission_with_scope(q[0], q[1], q[2]), False),
+        ("PermissionIndex.roles_with_permission", lambda q: index.roles_with_permission(q[1]), False),
+    ]
+
+
+def run_scaling_suite(n_roles: int, n_perms: int, depth: int, n_queries: int, seed: int = 0):
+    """Print p50/p90/p99/max latency (µs) and tracemalloc peak (KiB) per function, per policy shape."""
+    print(f"\nscaling suite: roles={n_roles:,} entries={n_perms:,} depth={depth} queries={n_queries} seed={seed}")
+    for shape in _BENCH_SHAPES:
+        rp, rh = generate_policy(shape, n_roles, n_perms, depth, seed)
+        queries = generate_queries(rp, n_queries, seed)
+        print(f"\n[{shape}] edges={len(rh):,}")
+        print(f"  {'function':<42}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}{'peak KiB':>10}")
+        for name, fn, expensive in _suite_cases(rp, rh):
+            sample = queries[:max(1, n_queries // 10)] if expensive else queries
+            lat = _latencies(fn, sample)
+            peak = _peak_memory(fn, sample[:20])
+            p50, p90, p99 = (_percentile(lat, p) * 1e6 for p in (50, 90, 99))
+            print(f"  {name:<42}{p50:>10.1f}{p90:>10.1f}{p99:>10.1f}{lat[-1] * 1e6:>10.1f}{peak / 1024:>10.1f}")
+
+
+def _time_it(fn, repeat: int = 3) -> float:
+    """Best wall-clock seconds over repeat runs of fn()."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmarks():
+    # ----- check_many vs looping has_permission_with_scope -----
+    n_roles, depth = 200, 10
+    rp = {f"r{i}": [f"read:res{i}", ("read:scoped", {"team_id": f"t{i % 7}"})] for i in range(n_roles)}
+    rh = [(f"r{i}", f"r{i - 1}") for i in range(1, n_roles) if i % depth]
+    # Request roles come from the generated policy: chain leaves first (deepest closures), then the rest.
+    leaves = [r for r in rp if int(r[1:]) % depth == depth - 1]
+    role_pool = leaves + [r for r in rp if r not in leaves]
+    for batch_size, roles_per_batch in [(500, 1), (500, 20), (5000, 50)]:
+        roles = role_pool[:roles_per_batch]
+        assert len(roles) == roles_per_batch and all(r in rp for r in roles)
+        reqs = [(roles[i % roles_per_batch], f"read:res{i % n_roles}", {"team_id": "t1"}) for i in range(batch_size)]
+        loop_t = _time_it(lambda: [has_permission_with_scope(r, p, rp, rh, s) for r, p, s in reqs])
+        batch_t = _time_it(lambda: check_many(reqs, rp, rh))
+        print(f"check_many batch={batch_size:>5} roles={roles_per_batch:>3}: "
+              f"loop {batch_size / loop_t:>10,.0f}/s  batch {batch_size / batch_t:>10,.0f}/s  "
+              f"speedup {loop_t / batch_t:5.1f}x")
+
+    # ----- tracing overhead (off should be ~0 vs calling the helpers directly) -----
+    rp, rh = generate_policy("deep_chain", n_roles=500, n_perms=5_000, depth=20, seed=0)
+    queries = generate_queries(rp, 2000)
+    direct_t = _time_it(lambda: [_check_roles_with_deny(_get_roles_with_inheritance(r, rh), p, rp)
+                                 for r, p, _ in queries], repeat=5)
+    off_t = _time_it(lambda: [has_permission_with_deny(r, p, rp, rh) for r, p, _ in queries], repeat=5)
+    previous = set_tracer(DecisionTracer())
+    on_t = _time_it(lambda: [has_permission_with_deny(r, p, rp, rh) for r, p, _ in queries], repeat=5)
+    set_tracer(previous)
+    print(f"tracing has_permission_with_deny: off {(off_t / direct_t - 1) * 100:+5.1f}%  "
+          f"on {(on_t / direct_t - 1) * 100:+5.1f}%  (vs untraced helpers, {len(queries)} checks)")
+
+    # ----- cold start: JSON + closures vs mmap'd snapshot -----
+    rp, rh = generate_policy("deep_chain", n_roles=10_000, n_perms=100_000, depth=50, seed=0)
+    policy_json = json.dumps({"role_permissions": rp, "role_hierarchy": rh})
+
+    def cold_start_json():
+        data = json.loads(policy_json)
+        parent_map = _build_parent_map([tuple(e) for e in data["role_hierarchy"]])
+        return {r: _roles_from_parent_map(r, parent_map) for r in data["role_permissions"]}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "policy.acps")
+        size = write_policy_snapshot(path, rp, rh)
+        json_t = _time_it(cold_start_json, repeat=1)
+        snaps = []
+        snap_t = _time_it(lambda: snaps.append(PolicySnapshot(path)))
+        print(f"cold start (10k roles, 100k entries): json+closures {json_t * 1e3:8.1f} ms  "
+              f"snapshot {snap_t * 1e3:8.3f} ms  ({size / 1024:,.0f} KiB vs {len(policy_json) / 1024:,.0f} KiB json)")
+        queries = generate_queries(rp, 2000)
+        check_t = _time_it(lambda: [snaps[0].has_permission_with_scope(r, p, sc) for r, p, sc in queries])
+        print(f"snapshot has_permission_with_scope: {len(queries) / check_t:,.0f}/s")
+        for snap in snaps:
+            snap.close()
+
+    # ----- scaling suite (--full: 10k roles, 50 deep, 100k entries) -----
+    if "--full" in sys.argv:
+        run_scaling_suite(n_roles=10_000, n_perms=100_000, depth=50, n_queries=500)
+    else:
+        run_scaling_suite(n_roles=1_000, n_perms=10_000, depth=20, n_queries=300)
+
+
 if __name__ == "__main__":
-    run_tests()
+    if "--bench" in sys.argv:
+        run_benchmarks()
+    else:
+        run_tests()
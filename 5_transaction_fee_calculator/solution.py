@@ -1,7 +1,29 @@
 """
 Transaction Fee Calculator - Solution with manual tests.
-Run: python3 solution.py
+Run: python3 solution.py          # tests
+     python3 solution.py --bench  # benchmarks (add --full for 10M / 100M-row runs)
 """
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:  # optional: the fee engine falls back to per-row integer math
+    np = None
 
 
 def parse_transaction(line: str):
@@ -123,6 +145,714 @@ def calculate_user_fees_with_errors(transactions: list) -> tuple:
     return user_fees, invalid_count
 
 
+# ---------------------------------------------------------------------------
+# Performance: streaming, constant-memory aggregation from CSV files
+# ---------------------------------------------------------------------------
+# Example:
+#   calculate_user_fees_streaming("settlement.csv")           -> ({"u1": 20, ...}, invalid_count)
+#   calculate_user_fees_streaming(["a.csv", "b.csv.gz"], rate_map={"card": 0.02, "paypal": 0.03})
+# Files are read in large binary chunks (gzip detected by magic bytes) and split into lines, so memory
+# is one buffer plus one dict entry per distinct user — independent of the number of lines.
+# Without rate_map: same rules as calculate_user_fees_with_errors (parse_transaction + calculate_fee).
+# With rate_map: same rules as calculate_user_fees_with_rates (parse_transaction_with_provider).
+# ---------------------------------------------------------------------------
+
+_GZIP_MAGIC = b"\x1f\x8b"
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+
+def _open_transaction_file(path: str):
+    """Open a plain or gzip CSV for binary reads."""
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    if magic == _GZIP_MAGIC:
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_transaction_lines(paths, buffer_size: int = DEFAULT_BUFFER_SIZE):
+    """Yield decoded lines (without newline) from one path or a list of paths, reading buffer_size bytes at a time."""
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        with _open_transaction_file(path) as f:
+            yield from _iter_lines(f, buffer_size)
+
+
+def _iter_lines(f, buffer_size: int, limit: int = None):
+    """Split a binary stream into decoded lines; stop after limit bytes if given."""
+    pending = b""
+    while limit is None or limit > 0:
+        chunk = f.read(buffer_size if limit is None else min(buffer_size, limit))
+        if not chunk:
+            break
+        if limit is not None:
+            limit -= len(chunk)
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.decode("utf-8", "replace")
+    if pending:
+        yield pending.decode("utf-8", "replace")
+
+
+def _aggregate_lines(lines, rate_map: dict = None) -> tuple:
+    """(user_fees, invalid_count) over any iterable of lines; see calculate_user_fees_streaming for the rules."""
+    user_fees = {}
+    invalid_count = 0
+    if rate_map is None:
+        for line in lines:
+            txn = parse_transaction(line)
+            if txn is None:
+                invalid_count += 1
+                continue
+            user_id = txn["user_id"]
+            user_fees[user_id] = user_fees.get(user_id, 0) + calculate_fee(txn["amount"], txn["status"])
+        return user_fees, invalid_count
+    for line in lines:
+        txn = parse_transaction_with_provider(line)
+        if txn is None:
+            invalid_count += 1
+            continue
+        if txn["status"] != "completed":
+            continue
+        fee = int(txn["amount"] * rate_map.get(txn["provider"], 0.02))
+        user_id = txn["user_id"]
+        user_fees[user_id] = user_fees.get(user_id, 0) + fee
+    return user_fees, invalid_count
+
+
+def calculate_user_fees_streaming(paths, rate_map: dict = None, buffer_size: int = DEFAULT_BUFFER_SIZE) -> tuple:
+    """
+    Stream one or more CSV files (plain or gzip) and return (user_fees_dict, invalid_line_count).
+    Example:
+        file contains "u1,1000,completed\nbad\nu1,500,failed\n"
+        calculate_user_fees_streaming(path) -> ({"u1": 20}, 1)
+    """
+    return _aggregate_lines(iter_transaction_lines(paths, buffer_size), rate_map)
+
+
+# ---------------------------------------------------------------------------
+# Performance: parallel sharded aggregation (process pool over newline-aligned byte ranges)
+# ---------------------------------------------------------------------------
+# Example:
+#   calculate_user_fees_parallel("settlement.csv", workers=8)  -> same (user_fees, invalid_count) as
+#   calculate_user_fees_streaming("settlement.csv"), i.e. calculate_user_fees_with_errors over its lines.
+# Each plain file is cut into byte ranges that start right after a newline; every range is parsed by
+# _aggregate_lines in a worker and the partial dicts / invalid counts are summed. Gzip files cannot be
+# split, so each one is a single shard.
+# ---------------------------------------------------------------------------
+
+def _split_byte_ranges(path: str, n_shards: int) -> list:
+    """[(start, end), ...] covering the file, each boundary moved forward to just after a newline."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    with _open_transaction_file(path) as f:
+        if isinstance(f, gzip.GzipFile):
+            return [(0, None)]
+        bounds = [0]
+        for i in range(1, n_shards):
+            target = max(size * i // n_shards, bounds[-1])
+            f.seek(max(target - 1, 0))
+            if target > 0:
+                f.readline()  # finish the line containing target - 1
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _aggregate_range(task: tuple) -> tuple:
+    """Worker: aggregate one (path, start, end, rate_map, buffer_size) shard."""
+    path, start, end, rate_map, buffer_size = task
+    with _open_transaction_file(path) as f:
+        f.seek(start)
+        limit = None if end is None else end - start
+        return _aggregate_lines(_iter_lines(f, buffer_size, limit), rate_map)
+
+
+def _merge_partials(partials) -> tuple:
+    user_fees = {}
+    invalid_count = 0
+    for fees, invalid in partials:
+        invalid_count += invalid
+        for user_id, fee in fees.items():
+            user_fees[user_id] = user_fees.get(user_id, 0) + fee
+    return user_fees, invalid_count
+
+
+def calculate_user_fees_parallel(paths, rate_map: dict = None, workers: int = None, shards_per_worker: int = 4,
+                                 buffer_size: int = DEFAULT_BUFFER_SIZE) -> tuple:
+    """
+    Like calculate_user_fees_streaming, but shards the files across a process pool.
+    workers defaults to os.cpu_count(); workers=1 runs the shards in-process.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    workers = workers or os.cpu_count() or 1
+    tasks = [(path, start, end, rate_map, buffer_size)
+             for path in paths
+             for start, end in _split_byte_ranges(path, workers * shards_per_worker)]
+    if workers == 1 or len(tasks) <= 1:
+        return _merge_partials(map(_aggregate_range, tasks))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return _merge_partials(pool.map(_aggregate_range, tasks))
+
+
+# ---------------------------------------------------------------------------
+# Performance: exact integer basis-point fee engine (vectorized with NumPy when installed)
+# ---------------------------------------------------------------------------
+# Example:
+#   schedule = FeeSchedule.from_rate_map({"card": 0.02, "paypal": 0.03})   # 200 / 300 bps
+#   schedule.compute_fees([1000, 1000, 500], [STATUS_COMPLETED, STATUS_COMPLETED, STATUS_OTHER],
+#                         [schedule.provider_code("card"), schedule.provider_code("paypal"), 0])
+#   -> [20, 30, 0]
+#   calculate_user_fees_exact(["u1,99999999999999999,completed"]) -> {"u1": 1999999999999999}
+#   (int(99999999999999999 * 0.02) gives 2000000000000000: float rounding, one cent off)
+# Fees are amount * bps // 10_000 (floor, like int(amount * rate) for non-negative amounts) and the
+# dispute_won flat fee from calculate_fee_with_provider. Whole columns are computed at once with int64
+# NumPy arrays; without NumPy (or if a product could overflow int64) the same integer formula runs
+# per row on Python ints, so results are identical either way.
+# ---------------------------------------------------------------------------
+
+STATUS_COMPLETED, STATUS_DISPUTE_WON, STATUS_OTHER = 0, 1, 2
+_STATUS_CODES = {"completed": STATUS_COMPLETED, "dispute_won": STATUS_DISPUTE_WON}
+_BPS_DENOMINATOR = 10_000
+_INT64_MAX = (1 << 63) - 1
+
+
+def rate_to_bps(rate) -> int:
+    """Exact basis points for a decimal rate. Example: rate_to_bps(0.029) -> 290. Sub-bps rates raise ValueError."""
+    bps = Decimal(str(rate)) * _BPS_DENOMINATOR
+    if bps != bps.to_integral_value() or bps < 0:
+        raise ValueError(f"rate is not a whole number of basis points: {rate!r}")
+    return int(bps)
+
+
+def encode_status(status: str) -> int:
+    return _STATUS_CODES.get(status, STATUS_OTHER)
+
+
+class FeeSchedule:
+    """
+    Integer fee rules: completed -> amount * bps(provider) // 10_000; dispute_won -> flat cents by provider.
+    Providers get small integer codes; any provider not listed shares the default code.
+    """
+
+    def __init__(self, rate_bps: dict = None, default_bps: int = 200, dispute_fee_cents: dict = None):
+        rate_bps = rate_bps or {}
+        dispute_fee_cents = {"card": 15} if dispute_fee_cents is None else dispute_fee_cents
+        self.providers = sorted(set(rate_bps) | set(dispute_fee_cents))
+        self._codes = {p: i for i, p in enumerate(self.providers)}
+        self.default_code = len(self.providers)
+        self.bps_table = [rate_bps.get(p, default_bps) for p in self.providers] + [default_bps]
+        self.dispute_table = [dispute_fee_cents.get(p, 0) for p in self.providers] + [0]
+
+    @classmethod
+    def from_rate_map(cls, rate_map: dict, default_rate: float = 0.02) -> "FeeSchedule":
+        """Rules of calculate_user_fees_with_rates: per-provider rate, no dispute fee."""
+        return cls({p: rate_to_bps(r) for p, r in rate_map.items()}, rate_to_bps(default_rate), {})
+
+    def provider_code(self, provider: str) -> int:
+        return self._codes.get(provider, self.default_code)
+
+    def fee(self, amount: int, status: str, provider: str) -> int:
+        """Single-row fee; same integer formula as compute_fees."""
+        status_code = encode_status(status)
+        if status_code == STATUS_COMPLETED:
+            return amount * self.bps_table[self.provider_code(provider)] // _BPS_DENOMINATOR
+        if status_code == STATUS_DISPUTE_WON:
+            return self.dispute_table[self.provider_code(provider)]
+        return 0
+
+    def _fits_int64(self, amounts) -> bool:
+        """True if every amount * bps product fits in int64 (so the vectorized path is exact)."""
+        try:
+            largest = int(np.asarray(amounts, dtype=np.int64).max())
+        except OverflowError:
+            return False
+        return largest <= _INT64_MAX // max(max(self.bps_table), 1)
+
+    def compute_fees(self, amounts, status_codes, provider_codes):
+        """Fee per row. Returns an int64 NumPy array when NumPy is available, else a list of ints."""
+        if np is not None and len(amounts) and self._fits_int64(amounts):
+            amounts = np.asarray(amounts, dtype=np.int64)
+            status = np.asarray(status_codes, dtype=np.int8)
+            prov = np.asarray(provider_codes, dtype=np.intp)
+            completed_fee = amounts * np.asarray(self.bps_table, dtype=np.int64)[prov] // _BPS_DENOMINATOR
+            dispute_fee = np.asarray(self.dispute_table, dtype=np.int64)[prov]
+            return np.where(status == STATUS_COMPLETED, completed_fee,
+                            np.where(status == STATUS_DISPUTE_WON, dispute_fee, 0))
+        if np is not None and isinstance(amounts, np.ndarray):
+            amounts = amounts.tolist()  # exact Python ints, no int64 wraparound
+        bps, dispute = self.bps_table, self.dispute_table
+        return [
+            a * bps[p] // _BPS_DENOMINATOR if s == STATUS_COMPLETED else dispute[p] if s == STATUS_DISPUTE_WON else 0
+            for a, s, p in zip(amounts, status_codes, provider_codes)
+        ]
+
+
+# ---------------------------------------------------------------------------
+# Performance: columnar ingest with interned codes + group-by
+# ---------------------------------------------------------------------------
+# Example:
+#   cols = ingest_columns(["u1,1000,completed,card", "u2,500,failed", "u1,0,dispute_won,card", "bad"])
+#   cols.user_ids   -> ["u1", "u2"]        cols.user_codes -> [0, 1, 0]
+#   cols.statuses   -> ["completed", "failed", "dispute_won"]   cols.status_codes -> [0, 1, 2]
+#   cols.invalid_count -> 1
+#   group_sum(cols.user_codes, cols.fees(FeeSchedule()), len(cols.user_ids)) -> [35, 0]
+# user_id / status / provider strings are stored once; rows hold small integer codes in typed arrays.
+# Per-user totals come from np.bincount when rows * max|value| (computed in Python ints) is below 2**53,
+# np.add.at on int64 when it is below 2**63, and otherwise — or without NumPy — a loop over Python ints,
+# so totals are exact at any size. Output is mapped back to {user_id: fee}.
+# ---------------------------------------------------------------------------
+
+def _intern(index: dict, names: list, value: str) -> int:
+    code = index.get(value)
+    if code is None:
+        code = index[value] = len(names)
+        names.append(value)
+    return code
+
+
+class TransactionColumns:
+    """Parsed transactions (parse_transaction_with_provider rules) as code/amount columns."""
+
+    def __init__(self):
+        self.user_ids, self.statuses, self.providers = [], [], []
+        self.user_codes, self.status_codes, self.provider_codes = array("q"), array("q"), array("q")
+        self.amounts = array("q")
+        self.invalid_count = 0
+
+    def __len__(self) -> int:
+        return len(self.user_codes)
+
+    def _column(self, values):
+        return np.frombuffer(values, dtype=np.int64) if np is not None and isinstance(values, array) else values
+
+    def fees(self, schedule: FeeSchedule):
+        """Fee per row under schedule (NumPy int64 array when available, else list)."""
+        fee_status = [encode_status(st) for st in self.statuses]
+        fee_provider = [schedule.provider_code(pv) for pv in self.providers]
+        if np is not None:
+            status_codes = np.asarray(fee_status, dtype=np.int8)[self._column(self.status_codes)]
+            provider_codes = np.asarray(fee_provider, dtype=np.intp)[self._column(self.provider_codes)]
+        else:
+            status_codes = [fee_status[c] for c in self.status_codes]
+            provider_codes = [fee_provider[c] for c in self.provider_codes]
+        return schedule.compute_fees(self._column(self.amounts), status_codes, provider_codes)
+
+
+def ingest_columns(transactions) -> TransactionColumns:
+    """Parse lines once into interned columns; invalid lines are counted, not stored."""
+    cols = TransactionColumns()
+    users, statuses, providers = {}, {}, {}
+    for line in transactions:
+        txn = parse_transaction_with_provider(line)
+        if txn is None:
+            cols.invalid_count += 1
+            continue
+        if not isinstance(cols.amounts, list) and txn["amount"] > _INT64_MAX:
+            cols.amounts = list(cols.amounts)  # keep exact Python ints beyond int64
+        cols.amounts.append(txn["amount"])
+        cols.user_codes.append(_intern(users, cols.user_ids, txn["user_id"]))
+        cols.status_codes.append(_intern(statuses, cols.statuses, txn["status"]))
+        cols.provider_codes.append(_intern(providers, cols.providers, txn["provider"]))
+    return cols
+
+
+def group_sum(codes, values, n_groups: int) -> list:
+    """Exact per-code totals as Python ints: totals[c] = sum(values[i] for i with codes[i] == c)."""
+    if np is not None and isinstance(values, np.ndarray):
+        if len(values) == 0:
+            return [0] * n_groups
+        # Bound every partial sum in Python ints (np.abs / .sum() would wrap in int64 themselves).
+        bound = max(-int(values.min()), int(values.max())) * len(values)
+        if bound < 2 ** 63:
+            codes = np.frombuffer(codes, dtype=np.int64) if isinstance(codes, array) else np.asarray(codes, dtype=np.intp)
+            if bound < 2 ** 53:
+                return np.bincount(codes, weights=values, minlength=n_groups).astype(np.int64).tolist()
+            totals = np.zeros(n_groups, dtype=np.int64)
+            np.add.at(totals, codes, values)
+            return totals.tolist()
+        values = values.tolist()  # totals may leave int64: add exact Python ints
+    totals = [0] * n_groups
+    for c, v in zip(codes, values):
+        totals[c] += v
+    return totals
+
+
+def calculate_user_fees_exact(transactions, rate_map: dict = None) -> dict:
+    """
+    Exact integer version of the per-user fee functions, computed over interned columns.
+    rate_map=None: calculate_fee_with_provider rules (2%, dispute_won 15 on card), every valid row counted.
+    rate_map given: calculate_user_fees_with_rates rules (only users with a completed row appear).
+    Example:
+        calculate_user_fees_exact(["u1,1000,completed,card", "u1,0,dispute_won,card"]) -> {"u1": 35}
+    """
+    schedule = FeeSchedule() if rate_map is None else FeeSchedule.from_rate_map(rate_map)
+    cols = ingest_columns(transactions)
+    n_users = len(cols.user_ids)
+    totals = group_sum(cols.user_codes, cols.fees(schedule), n_users)
+    if rate_map is None:
+        return dict(zip(cols.user_ids, totals))
+    completed = cols.statuses.index("completed") if "completed" in cols.statuses else -1
+    if np is not None:
+        flags = (cols._column(cols.status_codes) == completed).astype(np.int64)
+    else:
+        flags = [int(c == completed) for c in cols.status_codes]
+    has_completed = group_sum(cols.user_codes, flags, n_users)
+    return {u: t for u, t, n in zip(cols.user_ids, totals, has_completed) if n}
+
+
+# ---------------------------------------------------------------------------
+# Performance: multi-dimensional rollups in one pass
+# ---------------------------------------------------------------------------
+# Example:
+#   rollups, invalid = rollup_fees(lines, ["user_id", "provider", "status", ("user_id", "provider")])
+#   rollups["provider"]["card"]               -> {"fee": 35, "amount": 1000, "count": 2}
+#   rollups[("user_id", "provider")][("u1", "card")] -> {"fee": 35, "amount": 1000, "count": 2}
+# Each line is parsed (parse_transaction_with_provider) and priced (FeeSchedule) once, then added to
+# every requested grouping. Works on lists or iter_transaction_lines(...) for a single pass over files.
+# ---------------------------------------------------------------------------
+
+ROLLUP_FIELDS = ("user_id", "status", "provider")
+
+
+def rollup_fees(transactions, dimensions: list, rate_map: dict = None) -> tuple:
+    """
+    Return ({dimension: {group_key: {"fee", "amount", "count"}}}, invalid_line_count).
+    A dimension is a field name ("user_id", "status", "provider") or a tuple/list of them; multi-field
+    dimensions are keyed by their tuple in the result and use tuple group keys. Fees follow calculate_user_fees_exact (rate_map=None: 2% +
+    dispute_won flat fee; rate_map: per-provider rate on completed rows, 0 otherwise).
+    """
+    schedule = FeeSchedule() if rate_map is None else FeeSchedule.from_rate_map(rate_map)
+    prepared = []
+    for dim in dimensions:
+        fields = (dim,) if isinstance(dim, str) else tuple(dim)
+        if not fields or any(f not in ROLLUP_FIELDS for f in fields):
+            raise ValueError(f"unknown rollup dimension: {dim!r}")
+        prepared.append((dim if isinstance(dim, str) else fields, fields, {}))
+    invalid_count = 0
+    for line in transactions:
+        txn = parse_transaction_with_provider(line)
+        if txn is None:
+            invalid_count += 1
+            continue
+        amount = txn["amount"]
+        fee = schedule.fee(amount, txn["status"], txn["provider"])
+        for _, fields, table in prepared:
+            key = txn[fields[0]] if len(fields) == 1 else tuple(txn[f] for f in fields)
+            agg = table.get(key)
+            if agg is None:
+                table[key] = [fee, amount, 1]
+            else:
+                agg[0] += fee
+                agg[1] += amount
+                agg[2] += 1
+    rollups = {
+        dim: {key: {"fee": agg[0], "amount": agg[1], "count": agg[2]} for key, agg in table.items()}
+        for dim, _, table in prepared
+    }
+    return rollups, invalid_count
+
+
+# ---------------------------------------------------------------------------
+# Performance: incremental, checkpointed fee ledger
+# ---------------------------------------------------------------------------
+# Example:
+#   ledger = FeeLedger("fees.ledger")              # loads saved state if the file exists
+#   ledger.apply_file("2024-05-01T10.csv")         # -> lines applied; totals + checkpoint saved
+#   ledger.apply_file("2024-05-01T10.csv")         # -> 0 (already applied up to its end)
+#   ledger.apply_file("copy-of-10.csv")            # -> 0 (same content under a new name)
+#   ledger.user_fees -> {"u1": 20, ...}   ledger.invalid_count -> 3
+# Checkpoints map a source id (default: file name) to the byte offset applied so far plus a digest of
+# the file's first bytes, so a grown file resumes at its offset and a replaced file is rejected.
+# Only complete lines are applied; pass final=False for files still being written. Once a source is
+# applied with final=True it is closed and skipped afterwards. Each call reads the file once: the
+# whole-content digest (to spot a copy under a new name) and the prefix digest are computed from the
+# bytes being applied, and the file's totals are held aside until the copy check has passed.
+# On-disk format: header, JSON metadata (checkpoints, counters, rate_map), then the user ids as one
+# newline-joined blob and an int64 totals array — loading is a split plus a frombytes.
+# ---------------------------------------------------------------------------
+
+_LEDGER_MAGIC = b"FLDG"
+_LEDGER_VERSION = 1
+_LEDGER_HEADER = struct.Struct("<4sHxxIQQ")  # magic, version, meta_len, ids_len, n_users
+_CHECKPOINT_PREFIX = 64 * 1024
+
+
+def _file_digest(path: str, limit: int = None, opener=_open_transaction_file) -> str:
+    """sha256 of a file's (decompressed) content, or of its first limit bytes."""
+    h = hashlib.sha256()
+    with opener(path) as f:
+        remaining = limit
+        while remaining is None or remaining > 0:
+            chunk = f.read(DEFAULT_BUFFER_SIZE if remaining is None else min(DEFAULT_BUFFER_SIZE, remaining))
+            if not chunk:
+                break
+            h.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return h.hexdigest()
+
+
+class FeeLedger:
+    """Per-user fee totals persisted at path and updated file by file (rules of calculate_user_fees_streaming)."""
+
+    def __init__(self, path: str, rate_map: dict = None, opener=_open_transaction_file):
+        self.path = path
+        self.rate_map = rate_map
+        self.opener = opener           # path -> binary file object; used for every source read
+        self.user_fees = {}
+        self.invalid_count = 0
+        self.checkpoints = {}          # source_id -> {"offset", "prefix_sha256", "sha256" (if complete), "complete"}
+        self.completed_digests = {}    # sha256 of a fully applied file -> source_id
+        if os.path.exists(path):
+            self._load()
+
+    def apply_file(self, path: str, source_id: str = None, final: bool = True, save: bool = True) -> int:
+        """
+        Apply the not-yet-applied lines of path in one read. Return how many lines were applied.
+        A source applied with final=True is re-checked in full on later calls: an identical
+        re-delivery returns 0, a grown one applies only the tail, and any other change raises.
+        """
+        source_id = source_id or os.path.basename(path)
+        checkpoint = self.checkpoints.get(source_id)
+        start, applied_sha256 = 0, None
+        if checkpoint is not None:
+            prefix_len = min(checkpoint["offset"], _CHECKPOINT_PREFIX)
+            if _file_digest(path, prefix_len, self.opener) != checkpoint["prefix_sha256"]:
+                raise ValueError(f"{source_id} changed since its checkpoint")
+            start = checkpoint["offset"]
+            if checkpoint["complete"]:
+                applied_sha256 = checkpoint["sha256"]
+
+        # The whole-content digest (for final or re-checked sources) and the prefix digest come from the
+        # same pass that applies the lines; the totals are kept aside until the content is known to be new.
+        full = hashlib.sha256() if final or applied_sha256 else None
+        head = bytearray()
+        fees, invalid, applied = {}, 0, 0
+
+        def apply(lines):
+            nonlocal invalid, applied
+            batch, bad = _aggregate_lines((line.decode("utf-8", "replace") for line in lines), self.rate_map)
+            for user_id, fee in batch.items():
+                fees[user_id] = fees.get(user_id, 0) + fee
+            invalid += bad
+            applied += len(lines)
+
+        with self.opener(path) as f:
+            if full is not None and start:
+                remaining = start  # resumed source: hash the part applied earlier
+                while remaining:
+                    chunk = f.read(min(DEFAULT_BUFFER_SIZE, remaining))
+                    if not chunk:
+                        break
+                    full.update(chunk)
+                    remaining -= len(chunk)
+                if applied_sha256 and (remaining or full.hexdigest() != applied_sha256):
+                    raise ValueError(f"{source_id} changed since it was applied")
+            else:
+                f.seek(start)
+            offset, pending = start, b""
+            while True:
+                chunk = f.read(DEFAULT_BUFFER_SIZE)
+                if not chunk:
+                    break
+                if full is not None:
+                    full.update(chunk)
+                if start == 0 and len(head) < _CHECKPOINT_PREFIX:
+                    head += chunk[:_CHECKPOINT_PREFIX - len(head)]
+                data = pending + chunk
+                cut = data.rfind(b"\n")
+                if cut < 0:
+                    pending = data
+                    continue
+                apply(data[:cut].split(b"\n"))
+                offset += cut + 1
+                pending = data[cut + 1:]
+            if final and pending:
+                apply([pending])
+                offset += len(pending)
+
+        if applied_sha256 and offset == start:
+            return 0  # identical re-delivery of a complete source
+        digest = full.hexdigest() if final else None
+        if start == 0 and digest in self.completed_digests:
+            self.checkpoints[source_id] = dict(self.checkpoints[self.completed_digests[digest]])
+            if save:
+                self.save()
+            return 0
+        user_fees = self.user_fees
+        for user_id, fee in fees.items():
+            user_fees[user_id] = user_fees.get(user_id, 0) + fee
+        self.invalid_count += invalid
+        prefix_len = min(offset, _CHECKPOINT_PREFIX)
+        self.checkpoints[source_id] = {
+            "offset": offset,
+            "prefix_sha256": (hashlib.sha256(head[:prefix_len]).hexdigest() if start == 0
+                              else _file_digest(path, prefix_len, self.opener)),
+            "sha256": digest,
+            "complete": final,
+        }
+        if final:
+            self.completed_digests[digest] = source_id
+        if save:
+            self.save()
+        return applied
+
+    def save(self) -> None:
+        """Write the ledger atomically (temp file + rename)."""
+        meta = json.dumps({
+            "rate_map": self.rate_map,
+            "invalid_count": self.invalid_count,
+            "checkpoints": self.checkpoints,
+            "completed_digests": self.completed_digests,
+            "byteorder": sys.byteorder,
+        }).encode("utf-8")
+        ids = "\n".join(self.user_fees).encode("utf-8")
+        totals = array("q", self.user_fees.values())
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_LEDGER_HEADER.pack(_LEDGER_MAGIC, _LEDGER_VERSION, len(meta), len(ids), len(totals)))
+            f.write(meta)
+            f.write(ids)
+            f.write(totals.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def _load(self) -> None:
+        with open(self.path, "rb") as f:
+            data = f.read()
+        magic, version, meta_len, ids_len, n_users = _LEDGER_HEADER.unpack_from(data, 0)
+        if magic != _LEDGER_MAGIC:
+            raise ValueError(f"not a fee ledger: {self.path}")
+        if version != _LEDGER_VERSION:
+            raise ValueError(f"unsupported ledger version: {version}")
+        pos = _LEDGER_HEADER.size
+        meta = json.loads(data[pos:pos + meta_len])
+        if meta["rate_map"] != self.rate_map:
+            raise ValueError("ledger was built with a different rate_map")
+        pos += meta_len
+        ids = data[pos:pos + ids_len].decode("utf-8").split("\n") if n_users else []
+        totals = array("q")
+        totals.frombytes(data[pos + ids_len:pos + ids_len + 8 * n_users])
+        if meta["byteorder"] != sys.byteorder:
+            totals.byteswap()
+        self.user_fees = dict(zip(ids, totals.tolist()))
+        self.invalid_count = meta["invalid_count"]
+        self.checkpoints = meta["checkpoints"]
+        self.completed_digests = meta["completed_digests"]
+
+
+# ---------------------------------------------------------------------------
+# Performance: external-memory (spill-to-disk) aggregation for high-cardinality users
+# ---------------------------------------------------------------------------
+# Example:
+#   for user_id, fee in iter_user_fees_external(iter_transaction_lines("huge.csv"), max_users=5_000_000):
+#       write_out(user_id, fee)
+#   calculate_user_fees_external(lines, max_users=3) -> same as calculate_user_fees_with_errors(lines)
+# Partial totals live in a dict until it holds max_users entries; then the dict is hash-partitioned
+# (crc32 of user_id) into temp files as pickled (user_id, fee) blocks and cleared. Pickle rather than
+# text lines, so user ids containing "\r", "\n" or "," (which the parser accepts) round-trip exactly. Afterwards each partition is
+# aggregated on its own (re-partitioned with a new salt if it is still too big), so memory stays at
+# about max_users entries no matter how many distinct users there are.
+# ---------------------------------------------------------------------------
+
+_MAX_SPILL_DEPTH = 8
+
+
+def _fee_pairs(lines, rate_map: dict, invalid: list):
+    """(user_id, fee) per valid line, rules of _aggregate_lines; invalid[0] counts skipped lines."""
+    if rate_map is None:
+        for line in lines:
+            txn = parse_transaction(line)
+            if txn is None:
+                invalid[0] += 1
+                continue
+            yield txn["user_id"], calculate_fee(txn["amount"], txn["status"])
+        return
+    for line in lines:
+        txn = parse_transaction_with_provider(line)
+        if txn is None:
+            invalid[0] += 1
+            continue
+        if txn["status"] == "completed":
+            yield txn["user_id"], int(txn["amount"] * rate_map.get(txn["provider"], 0.02))
+
+
+def _read_spill(path: str):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                block = pickle.load(f)
+            except EOFError:
+                return
+            yield from block
+
+
+def _spill(totals: dict, files: list, depth: int) -> None:
+    """Append partial totals to their hash partition (one pickled block each) and clear the dict."""
+    seed = zlib.crc32(str(depth).encode("utf-8"))
+    blocks = [[] for _ in files]
+    for item in totals.items():
+        blocks[zlib.crc32(item[0].encode("utf-8", "surrogatepass"), seed) % len(files)].append(item)
+    for f, block in zip(files, blocks):
+        if block:
+            pickle.dump(block, f, pickle.HIGHEST_PROTOCOL)
+    totals.clear()
+
+
+def _aggregate_pairs_external(pairs, max_users: int, n_partitions: int, tmp_dir: str, depth: int = 0):
+    """Yield each (user_id, total) once, holding at most ~max_users partial totals in memory."""
+    totals = {}
+    files = None
+    for user_id, fee in pairs:
+        totals[user_id] = totals.get(user_id, 0) + fee
+        if len(totals) >= max_users and depth < _MAX_SPILL_DEPTH:
+            if files is None:
+                files = [open(os.path.join(tmp_dir, f"spill-{depth}-{i}.bin"), "wb")
+                         for i in range(n_partitions)]
+            _spill(totals, files, depth)
+    if files is None:
+        yield from totals.items()
+        return
+    _spill(totals, files, depth)
+    for f in files:
+        f.close()
+    for f in files:
+        sub_dir = tempfile.mkdtemp(dir=tmp_dir)
+        yield from _aggregate_pairs_external(_read_spill(f.name), max_users, n_partitions, sub_dir, depth + 1)
+        os.remove(f.name)
+
+
+def iter_user_fees_external(lines, max_users: int = 1_000_000, n_partitions: int = 16, rate_map: dict = None,
+                            tmp_dir: str = None, invalid: list = None):
+    """
+    Yield (user_id, total_fee) for every user, spilling to disk past max_users in-memory entries.
+    Pass invalid=[0] to receive the invalid line count (updated once the lines are consumed).
+    """
+    if max_users <= 0:
+        raise ValueError("max_users must be positive")
+    invalid = [0] if invalid is None else invalid
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as work_dir:
+        yield from _aggregate_pairs_external(_fee_pairs(lines, rate_map, invalid), max_users, n_partitions, work_dir)
+
+
+def calculate_user_fees_external(lines, max_users: int = 1_000_000, n_partitions: int = 16, rate_map: dict = None,
+                                 tmp_dir: str = None) -> tuple:
+    """(user_fees_dict, invalid_line_count) via iter_user_fees_external; equal to calculate_user_fees_with_errors."""
+    invalid = [0]
+    user_fees = dict(iter_user_fees_external(lines, max_users, n_partitions, rate_map, tmp_dir, invalid))
+    return user_fees, invalid[0]
+
+
 def run_tests():
     transactions = [
         "user123,1000,completed",
@@ -156,8 +886,354 @@ def run_tests():
     fees, inv = calculate_user_fees_with_errors(["u1,1000,completed", "bad", "u1,500,failed"])
     assert fees == {"u1": 20} and inv == 1
 
+    # Streaming from files (plain + gzip, small buffer to exercise chunk boundaries)
+    lines = transactions + ["bad", "", "u9,abc,completed", "u2,1000,dispute_won,card", "u2,1000,completed,paypal"]
+    data = "\n".join(lines).encode("utf-8")
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, "a.csv")
+        gz = os.path.join(tmp, "b.csv.gz")
+        with open(plain, "wb") as f:
+            f.write(data + b"\n")
+        with gzip.open(gz, "wb") as f:
+            f.write(data)
+        assert list(iter_transaction_lines(plain, buffer_size=7)) == lines
+        assert list(iter_transaction_lines([plain, gz], buffer_size=5)) == lines + lines
+        assert calculate_user_fees_streaming(plain, buffer_size=3) == calculate_user_fees_with_errors(lines)
+        fees2, inv2 = calculate_user_fees_streaming([plain, gz], rate_map={"paypal": 0.03})
+        assert fees2 == {k: 2 * v for k, v in calculate_user_fees_with_rates(lines, {"paypal": 0.03}).items()}
+        assert inv2 == 2 * sum(1 for line in lines if parse_transaction_with_provider(line) is None)
+
+        # Parallel shards: every split point must give the single-pass answer
+        size = len(data) + 1
+        for n_shards in (1, 2, 3, 7, size, size + 5):
+            ranges = _split_byte_ranges(plain, n_shards)
+            assert ranges[0][0] == 0 and ranges[-1][1] == size
+            assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+            assert _merge_partials(_aggregate_range((plain, a, b, None, 4)) for a, b in ranges) == \
+                calculate_user_fees_with_errors(lines)
+        assert _split_byte_ranges(gz, 4) == [(0, None)]
+        expected = calculate_user_fees_streaming([plain, gz])
+        assert calculate_user_fees_parallel([plain, gz], workers=1, shards_per_worker=3) == expected
+        assert calculate_user_fees_parallel([plain, gz], workers=2) == expected
+        assert calculate_user_fees_parallel([plain, gz], rate_map={"paypal": 0.03}, workers=2) == (fees2, inv2)
+
+    # Exact basis-point engine
+    assert rate_to_bps(0.02) == 200 and rate_to_bps(0.029) == 290
+    try:
+        rate_to_bps(0.00015)
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    schedule = FeeSchedule.from_rate_map({"card": 0.02, "paypal": 0.03})
+    fees_col = schedule.compute_fees([1000, 1000, 500], [STATUS_COMPLETED, STATUS_COMPLETED, STATUS_OTHER],
+                                     [schedule.provider_code("card"), schedule.provider_code("paypal"), 0])
+    assert list(fees_col) == [20, 30, 0]
+    assert calculate_user_fees_exact(["u1,1000,completed,card", "u1,0,dispute_won,card", "u2,0,dispute_won,paypal",
+                                      "u2,500,failed"]) == {"u1": 35, "u2": 0}
+    assert calculate_user_fees_exact(["u1,99999999999999999,completed"]) == {"u1": 1999999999999999}
+    assert calculate_user_fees_exact(["u1,123456789012345678901234567890,completed"]) == \
+        {"u1": 123456789012345678901234567890 * 2 // 100}  # beyond int64: per-row Python ints
+    mixed = lines + ["u3,123457,completed,paypal", "u3,999,completed,wire", "u4,77,pending,card"]
+    assert calculate_user_fees_exact(mixed, {"card": 0.02, "paypal": 0.03}) == \
+        calculate_user_fees_with_rates(mixed, {"card": 0.02, "paypal": 0.03})
+    assert calculate_user_fees_exact(transactions) == calculate_user_fees(transactions)
+
+    # Columnar ingest + group-by
+    cols = ingest_columns(["u1,1000,completed,card", "u2,500,failed", "u1,0,dispute_won,card", "bad"])
+    assert cols.user_ids == ["u1", "u2"] and list(cols.user_codes) == [0, 1, 0]
+    assert cols.statuses == ["completed", "failed", "dispute_won"] and list(cols.status_codes) == [0, 1, 2]
+    assert cols.providers == ["card"] and cols.invalid_count == 1 and len(cols) == 3
+    assert group_sum(cols.user_codes, cols.fees(FeeSchedule()), len(cols.user_ids)) == [35, 0]
+    assert group_sum([0, 2, 0], [1, 2, 3], 3) == [4, 0, 2]
+    if np is not None:
+        assert group_sum([0, 1, 0], np.array([2 ** 52, 5, 2 ** 52], dtype=np.int64), 2) == [2 ** 53, 5]  # add.at path
+        big = np.array([2 ** 62, 2 ** 62, 2 ** 62, -5], dtype=np.int64)  # totals leave int64: Python-int path
+        assert group_sum([0, 0, 1, 1], big, 2) == [2 ** 63, 2 ** 62 - 5]
+        wraps = np.array([-2 ** 63, 1], dtype=np.int64)  # np.abs(-2**63) wraps to a negative value
+        assert group_sum([0, 0], wraps, 1) == [-2 ** 63 + 1]
+        assert group_sum([], np.array([], dtype=np.int64), 2) == [0, 0]
+
+    # One-pass rollups
+    roll_lines = ["u1,1000,completed,card", "u1,0,dispute_won,card", "u1,500,completed,paypal", "u2,300,failed", "bad"]
+    rollups, inv = rollup_fees(roll_lines, ["user_id", "provider", "status", ("user_id", "provider")])
+    assert inv == 1
+    assert rollups["user_id"]["u1"] == {"fee": 45, "amount": 1500, "count": 3}
+    assert rollups["provider"]["card"] == {"fee": 35, "amount": 1300, "count": 3}
+    assert rollups["status"]["failed"] == {"fee": 0, "amount": 300, "count": 1}
+    assert rollups[("user_id", "provider")][("u1", "card")] == {"fee": 35, "amount": 1000, "count": 2}
+    assert {u: a["fee"] for u, a in rollups["user_id"].items()} == calculate_user_fees_exact(roll_lines)
+    as_list, _ = rollup_fees(roll_lines, [["user_id", "provider"]])
+    assert as_list[("user_id", "provider")] == rollups[("user_id", "provider")]
+    by_rate, _ = rollup_fees(mixed, ["user_id"], rate_map={"card": 0.02, "paypal": 0.03})
+    expected_rates = calculate_user_fees_with_rates(mixed, {"card": 0.02, "paypal": 0.03})
+    assert all(by_rate["user_id"][u]["fee"] == fee for u, fee in expected_rates.items())
+    try:
+        rollup_fees(roll_lines, ["amount"])
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+    # Incremental ledger with checkpoints
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger_path = os.path.join(tmp, "fees.ledger")
+        day = os.path.join(tmp, "day.csv")
+        with open(day, "w") as f:
+            f.write("u1,1000,completed\nbad\nu2,500,comp")  # last line still being written
+        ledger = FeeLedger(ledger_path)
+        assert ledger.apply_file(day, final=False) == 2
+        assert ledger.user_fees == {"u1": 20} and ledger.invalid_count == 1
+        with open(day, "a") as f:
+            f.write("leted\nu1,300,completed\n")
+        assert ledger.apply_file(day) == 2  # resumes at the checkpoint
+        assert ledger.apply_file(day) == 0  # re-delivered: nothing double counted
+        copy = os.path.join(tmp, "day-copy.csv.gz")
+        with open(day, "rb") as src, gzip.open(copy, "wb") as dst:
+            dst.write(src.read())
+        assert ledger.apply_file(copy) == 0  # same content under another name
+        with open(day, "a") as f:
+            f.write("u1,999,completed\n")
+        assert ledger.apply_file(day) == 1  # a complete source that grew: only the tail is applied
+        assert ledger.user_fees["u1"] == 20 + 6 + 19
+        opened = []
+
+        def counting_open(path):
+            opened.append(path)
+            return _open_transaction_file(path)
+
+        counted = FeeLedger(ledger_path, opener=counting_open)
+        fresh = os.path.join(tmp, "fresh.csv")
+        generate_settlement_csv(fresh, 20_000, seed=9)
+        assert os.path.getsize(fresh) > _CHECKPOINT_PREFIX
+        counted.apply_file(fresh, save=False)
+        assert opened == [fresh]  # a new final source is read exactly once (digests come from that pass)
+        with open(fresh, "rb+") as f:  # same size, changed past the checkpoint prefix
+            f.seek(-2, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-2, os.SEEK_END)
+            f.write(b"8" if last != b"8" else b"7")
+        try:
+            counted.apply_file(fresh, save=False)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+        reloaded = FeeLedger(ledger_path)
+        with open(day) as f:
+            assert (reloaded.user_fees, reloaded.invalid_count) == calculate_user_fees_with_errors(f.read().splitlines())
+        assert reloaded.checkpoints["day.csv"]["offset"] == os.path.getsize(day)
+        with open(day, "w") as f:
+            f.write("u9,1,completed\n")
+        try:
+            reloaded.apply_file(day)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+        try:
+            FeeLedger(ledger_path, rate_map={"card": 0.02})
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+
+    # External-memory aggregation with a tiny budget
+    big = [f"user{i % 37},{i * 7},{'completed' if i % 3 else 'failed'}" for i in range(500)] + ["bad", ""]
+    expected = calculate_user_fees_with_errors(big)
+    for max_users, n_partitions in [(1, 2), (3, 4), (5, 1), (10_000, 16)]:
+        assert calculate_user_fees_external(big, max_users=max_users, n_partitions=n_partitions) == expected
+    rated = mixed * 20
+    assert calculate_user_fees_external(rated, max_users=2, rate_map={"paypal": 0.03}) == (
+        calculate_user_fees_with_rates(rated, {"paypal": 0.03}),
+        sum(1 for line in rated if parse_transaction_with_provider(line) is None))
+    odd_ids = ["u\r1,100,completed", "u\r1,50,completed", "u\x0b2,70,completed", "u3,10,completed"] * 5
+    assert calculate_user_fees_external(odd_ids, max_users=1, n_partitions=2) == calculate_user_fees_with_errors(odd_ids)
+    pairs = list(iter_user_fees_external(big, max_users=4, n_partitions=3))
+    assert len(pairs) == len({u for u, _ in pairs}) == 37  # each user exactly once
+
+    # Benchmark generator: seeded, skewed, with invalid lines
+    with tempfile.TemporaryDirectory() as tmp:
+        a_path, b_path = os.path.join(tmp, "a.csv"), os.path.join(tmp, "b.csv.gz")
+        generate_settlement_csv(a_path, 2_000, seed=5, n_users=50, invalid_ratio=0.05, with_provider=True)
+        generate_settlement_csv(b_path, 2_000, seed=5, n_users=50, invalid_ratio=0.05, with_provider=True)
+        gen_lines = list(iter_transaction_lines(a_path))
+        assert len(gen_lines) == 2_000 and gen_lines == list(iter_transaction_lines(b_path))
+        parsed = [parse_transaction_with_provider(line) for line in gen_lines]
+        assert 0 < sum(t is None for t in parsed) < 300
+        counts = {}
+        for t in parsed:
+            if t is not None:
+                counts[t["user_id"]] = counts.get(t["user_id"], 0) + 1
+        assert counts["user0"] > 5 * counts.get("user49", 1)  # skewed towards low ranks
+        assert {t["provider"] for t in parsed if t} == {"card", "paypal", "bank"}
+
     print("All tests passed.")
 
 
+# ---------------------------------------------------------------------------
+# Benchmarks: seeded settlement generator + throughput suite (python3 solution.py --bench [--full])
+# ---------------------------------------------------------------------------
+# generate_settlement_csv(path, 1_000_000, seed=0) writes the same file for the same arguments:
+#   - users drawn from a Zipf-like distribution (a few heavy users, a long tail)
+#   - mixed statuses (completed / failed / pending / dispute_won) and providers (card / paypal / bank)
+#   - a configurable share of invalid lines (garbage, bad amounts, missing fields, empty lines)
+# The suite runs each fee function in a fresh interpreter (--bench-one) so peak RSS is per function.
+# ---------------------------------------------------------------------------
+
+_BENCH_STATUSES = (("completed", 0.80), ("failed", 0.10), ("pending", 0.05), ("dispute_won", 0.05))
+_BENCH_PROVIDERS = (("card", 0.70), ("paypal", 0.20), ("bank", 0.10))
+_BENCH_INVALID = ("bad", "", "u1,abc,completed", "u1,,completed", "u1,-5,completed", ",100,completed")
+_BENCH_FUNCTIONS = ("calculate_user_fees", "calculate_user_fees_with_rates", "calculate_user_fees_with_errors")
+_BENCH_RATE_MAP = {"card": 0.02, "paypal": 0.03, "bank": 0.01}
+
+
+def generate_settlement_csv(path: str, n_rows: int, seed: int = 0, n_users: int = 100_000, skew: float = 1.1,
+                            invalid_ratio: float = 0.01, with_provider: bool = False) -> None:
+    """Write n_rows seeded transaction lines (user_id,amount,status[,provider]); gzip if path ends with .gz."""
+    rng = random.Random(seed)
+    user_weights = list(accumulate(1 / (rank ** skew) for rank in range(1, n_users + 1)))
+    status_names, status_weights = zip(*_BENCH_STATUSES)
+    provider_names, provider_weights = zip(*_BENCH_PROVIDERS)
+    opener = gzip.open if path.endswith(".gz") else open
+    batch = 10_000
+    with opener(path, "wt", encoding="utf-8") as f:
+        for done in range(0, n_rows, batch):
+            k = min(batch, n_rows - done)
+            users = rng.choices(range(n_users), cum_weights=user_weights, k=k)
+            statuses = rng.choices(status_names, status_weights, k=k)
+            providers = rng.choices(provider_names, provider_weights, k=k)
+            out = []
+            for user, status, provider in zip(users, statuses, providers):
+                if rng.random() < invalid_ratio:
+                    out.append(rng.choice(_BENCH_INVALID))
+                    continue
+                amount = 0 if status == "dispute_won" else int(rng.lognormvariate(8, 1.5)) + 1
+                if with_provider:
+                    out.append(f"user{user},{amount},{status},{provider}")
+                else:
+                    out.append(f"user{user},{amount},{status}")
+            f.write("\n".join(out))
+            f.write("\n")
+
+
+def _peak_rss_kib():
+    """Peak resident set size of this process in KiB (VmHWM on Linux; ru_maxrss elsewhere; None if unknown)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _bench_one(func_name: str, path: str, n_rows: int) -> None:
+    """Child side of the suite: stream path through one fee function and print a JSON result line."""
+    lines = iter_transaction_lines(path)
+    start = time.perf_counter()
+    if func_name == "calculate_user_fees_with_rates":
+        calculate_user_fees_with_rates(lines, _BENCH_RATE_MAP)
+    else:
+        globals()[func_name](lines)
+    seconds = time.perf_counter() - start
+    print(json.dumps({"rows_per_sec": n_rows / seconds, "seconds": seconds, "peak_rss_kib": _peak_rss_kib()}))
+
+
+def run_throughput_suite(sizes: list, seed: int = 0) -> None:
+    """Print rows/s and peak RSS for each public fee function at each size."""
+    print(f"\n{'function':<34}{'rows':>14}{'rows/s':>14}{'peak RSS MiB':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in sizes:
+            files = {}
+            for with_provider in (False, True):
+                files[with_provider] = os.path.join(tmp, f"settle-{n_rows}-{int(with_provider)}.csv")
+                generate_settlement_csv(files[with_provider], n_rows, seed=seed, with_provider=with_provider)
+            for func_name in _BENCH_FUNCTIONS:
+                path = files[func_name == "calculate_user_fees_with_rates"]
+                out = subprocess.run([sys.executable, os.path.abspath(__file__), "--bench-one", func_name, path,
+                                      str(n_rows)], check=True, capture_output=True, text=True).stdout
+                result = json.loads(out.strip().splitlines()[-1])
+                rss = "n/a" if result["peak_rss_kib"] is None else f"{result['peak_rss_kib'] / 1024:,.1f}"
+                print(f"{func_name:<34}{n_rows:>14,}{result['rows_per_sec']:>14,.0f}{rss:>14}")
+            for path in files.values():
+                os.remove(path)
+
+
+def run_benchmarks():
+    n_rows = 2_000_000 if "--full" in sys.argv else 400_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.csv")
+        generate_settlement_csv(path, n_rows)
+
+        # ----- parallel scaling vs single-process streaming -----
+        start = time.perf_counter()
+        expected = calculate_user_fees_streaming(path)
+        base_t = time.perf_counter() - start
+        print(f"streaming      : {n_rows / base_t:>12,.0f} rows/s")
+        cores = os.cpu_count() or 1
+        workers = 1
+        while True:
+            start = time.perf_counter()
+            result = calculate_user_fees_parallel(path, workers=workers)
+            t = time.perf_counter() - start
+            assert result == expected
+            print(f"parallel w={workers:<3}: {n_rows / t:>12,.0f} rows/s  speedup {base_t / t:5.2f}x  "
+                  f"efficiency {base_t / t / workers * 100:5.1f}%")
+            if workers >= cores:
+                break
+            workers = min(workers * 2, cores)
+
+    # ----- exact bps engine vs per-row float fees (fee computation only, parsing excluded) -----
+    rng = random.Random(1)
+    n = 1_000_000
+    amounts = [rng.randrange(1, 1_000_000) for _ in range(n)]
+    statuses = [rng.choice(["completed", "completed", "dispute_won", "failed"]) for _ in range(n)]
+    providers = [rng.choice(["card", "paypal", "wire"]) for _ in range(n)]
+    start = time.perf_counter()
+    [calculate_fee_with_provider(a, st, pv) for a, st, pv in zip(amounts, statuses, providers)]
+    row_t = time.perf_counter() - start
+    schedule = FeeSchedule()
+    status_codes = [encode_status(st) for st in statuses]
+    provider_codes = [schedule.provider_code(pv) for pv in providers]
+    if np is not None:
+        amounts = np.asarray(amounts, dtype=np.int64)
+        status_codes = np.asarray(status_codes, dtype=np.int8)
+        provider_codes = np.asarray(provider_codes, dtype=np.intp)
+    start = time.perf_counter()
+    schedule.compute_fees(amounts, status_codes, provider_codes)
+    col_t = time.perf_counter() - start
+    engine = "numpy" if np is not None else "pure python"
+    print(f"fees per-row float: {n / row_t:>14,.0f} rows/s   bps engine ({engine}): {n / col_t:>14,.0f} rows/s")
+
+    # ----- per-user group-by: dict updates vs intern + group_sum (parsing excluded, interning included) -----
+    user_ids = [f"user{rng.randrange(200_000)}" for _ in range(n)]
+    fees = [a * 2 // 100 for a in range(n)]
+    start = time.perf_counter()
+    user_fees = {}
+    for user_id, fee in zip(user_ids, fees):
+        user_fees[user_id] = user_fees.get(user_id, 0) + fee
+    dict_t = time.perf_counter() - start
+    start = time.perf_counter()
+    index, names, codes = {}, [], array("q")
+    for user_id in user_ids:
+        codes.append(_intern(index, names, user_id))
+    fee_column = np.asarray(fees, dtype=np.int64) if np is not None else fees
+    grouped = dict(zip(names, group_sum(codes, fee_column, len(names))))
+    group_t = time.perf_counter() - start
+    assert grouped == user_fees
+    print(f"group-by dict.get:  {n / dict_t:>14,.0f} rows/s   interned group_sum ({engine}): {n / group_t:>14,.0f} rows/s")
+
+    # ----- throughput + peak memory per public function (--full: 1M / 10M / 100M rows) -----
+    run_throughput_suite([1_000_000, 10_000_000, 100_000_000] if "--full" in sys.argv else [1_000_000])
+
+
 if __name__ == "__main__":
-    run_tests()
+    if "--bench-one" in sys.argv:
+        i = sys.argv.index("--bench-one")
+        _bench_one(sys.argv[i + 1], sys.argv[i + 2], int(sys.argv[i + 3]))
+    elif "--bench" in sys.argv:
+        run_benchmarks()
+    else:
+        run_tests()
@@ -1,10 +1,21 @@
 """
 Webhook Signature Validator - Solution with manual tests.
-Run: python3 solution.py
+Run: python3 solution.py          # tests
+     python3 solution.py --bench  # benchmarks
 """
+import asyncio
 import hmac
 import hashlib
+import inspect
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
 import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
 
 
 def parse_signature_header(header: str):
@@ -90,6 +101,683 @@ def verify_webhook_and_event_type(body_json: dict, allowed_types: set) -> tuple:
     return True, ""
 
 
+# ---------------------------------------------------------------------------
+# Performance: reusable pre-keyed verifier, zero-copy bytes bodies
+# ---------------------------------------------------------------------------
+# Example:
+#   verifier = WebhookVerifier("whsec_test123")     # key schedule computed once
+#   verifier.verify("1234567890", body_bytes, sig)  -> True/False (same as verify_webhook_signature)
+#   verifier.verify_full(header, body_bytes)        -> (True, "") / (False, reason), like verify_webhook_full
+# Each request clones the keyed HMAC template and feeds timestamp, "." and the body as separate
+# updates, so a bytes/memoryview body is hashed in place instead of being copied into an f-string
+# and re-encoded. str bodies are encoded once.
+# ---------------------------------------------------------------------------
+
+def _as_bytes(data):
+    """str -> UTF-8 bytes; bytes / bytearray / memoryview are passed through untouched."""
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+
+def _signatures_match(expected: str, candidate) -> bool:
+    """Constant-time compare of a hex digest with an untrusted header value (bytes, so non-ASCII is just a mismatch)."""
+    if isinstance(candidate, str):
+        candidate = candidate.encode("utf-8", "surrogateescape")
+    return hmac.compare_digest(expected.encode("ascii"), candidate)
+
+
+class WebhookVerifier:
+    """HMAC-SHA256 webhook verifier bound to one secret."""
+
+    def __init__(self, secret):
+        self._template = hmac.new(_as_bytes(secret), digestmod=hashlib.sha256)
+
+    def begin(self, timestamp):
+        """Keyed HMAC already fed timestamp + "."; update() it with body chunks, then hexdigest()."""
+        mac = self._template.copy()
+        mac.update(_as_bytes(timestamp))
+        mac.update(b".")
+        return mac
+
+    def signature(self, timestamp, body) -> str:
+        """Hex HMAC-SHA256 of timestamp + "." + body."""
+        mac = self.begin(timestamp)
+        mac.update(_as_bytes(body))
+        return mac.hexdigest()
+
+    def verify(self, timestamp, body, signature: str) -> bool:
+        return _signatures_match(self.signature(timestamp, body), signature)
+
+    def verify_full(self, header: str, body, max_age_seconds: int = 300) -> tuple:
+        """verify_webhook_full with this verifier's secret; same reason codes."""
+        if not header:
+            return False, "missing_header"
+        parsed = parse_signature_header(header)
+        if parsed is None:
+            return False, "invalid_header"
+        ts, sig = parsed["t"], parsed["v1"]
+        ok_ts, _ = verify_timestamp(ts, max_age_seconds)
+        if not ok_ts:
+            return False, "timestamp_too_old"
+        if not self.verify(ts, body, sig):
+            return False, "invalid_signature"
+        return True, ""
+
+
+# ---------------------------------------------------------------------------
+# Performance: batch verification on a thread pool
+# ---------------------------------------------------------------------------
+# Example:
+#   verify_many([(header1, body1, secret), (header2, body2, secret)], max_workers=8)
+#   -> [(True, ""), (False, "invalid_signature")]   # in input order, verify_webhook_full reasons
+# hashlib releases the GIL while hashing large buffers, so threads verify big bodies in parallel.
+# One WebhookVerifier is built per distinct secret in the batch; consecutive small bodies are grouped
+# into ~256 KiB tasks so pool overhead does not dominate.
+# ---------------------------------------------------------------------------
+
+_BATCH_CHUNK_BYTES = 256 * 1024
+
+
+def verify_many(items, max_workers: int = None, max_age_seconds: int = 300, executor=None) -> list:
+    """
+    Verify (header, body, secret) items; return [(ok, reason), ...] in input order.
+    Pass executor to reuse a long-lived pool; max_workers=1 verifies inline.
+    """
+    verifiers = {}
+    jobs = []
+    for header, body, secret in items:
+        verifier = verifiers.get(secret)
+        if verifier is None:
+            verifier = verifiers[secret] = WebhookVerifier(secret)
+        jobs.append((verifier, header, body))
+
+    def run(chunk):
+        return [verifier.verify_full(header, body, max_age_seconds) for verifier, header, body in chunk]
+
+    if executor is None and (max_workers == 1 or len(jobs) <= 1):
+        return run(jobs)
+    chunks = _chunk_by_bytes(jobs, _BATCH_CHUNK_BYTES)
+    if executor is not None:
+        return [result for part in executor.map(run, chunks) for result in part]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return [result for part in pool.map(run, chunks) for result in part]
+
+
+def _chunk_by_bytes(jobs: list, target: int) -> list:
+    """Group consecutive jobs so each pool task hashes about target body bytes (small bodies share a task)."""
+    chunks, current, size = [], [], 0
+    for job in jobs:
+        current.append(job)
+        size += len(job[2])
+        if size >= target:
+            chunks.append(current)
+            current, size = [], 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# ---------------------------------------------------------------------------
+# Performance: multi-signature headers and secret rotation
+# ---------------------------------------------------------------------------
+# Example:
+#   parse_signature_header_all("t=123,v1=aaa,v1=bbb,v0=old") -> {"t": "123", "v1": ["aaa", "bbb"]}
+#   verifier = RotatingWebhookVerifier(["whsec_new", "whsec_old"])   # one keyed template per secret
+#   verifier.verify_full(header, body)      -> (True, "") if any v1 matches any active secret
+#   verifier.matching_secret(ts, body, sigs) -> index of the first secret that matched, or -1
+# The body is hashed once per secret (k HMACs for k secrets), each digest is compared against every
+# v1 value, and the search stops at the first match — no re-parsing or re-encoding per candidate.
+# ---------------------------------------------------------------------------
+
+def parse_signature_header_all(header: str):
+    """Like parse_signature_header, but keep every v1 value (in header order): {"t": ts, "v1": [sig, ...]}."""
+    if not header:
+        return None
+    timestamp = None
+    signatures = []
+    for part in header.split(","):
+        part = part.strip()
+        if "=" not in part:
+            return None
+        key, value = part.split("=", 1)
+        if key == "t":
+            timestamp = value
+        elif key == "v1":
+            signatures.append(value)
+    if timestamp is None or not signatures:
+        return None
+    return {"t": timestamp, "v1": signatures}
+
+
+class RotatingWebhookVerifier:
+    """Verifies against every active secret (e.g. new + old during rotation) and every v1 signature."""
+
+    def __init__(self, secrets: list):
+        if not secrets:
+            raise ValueError("at least one secret is required")
+        self._verifiers = [WebhookVerifier(secret) for secret in secrets]
+
+    def matching_secret(self, timestamp, body, signatures: list) -> int:
+        """Index of the first secret whose signature is among signatures, or -1."""
+        timestamp, body = _as_bytes(timestamp), _as_bytes(body)
+        for i, verifier in enumerate(self._verifiers):
+            expected = verifier.signature(timestamp, body)
+            for candidate in signatures:
+                if _signatures_match(expected, candidate):
+                    return i
+        return -1
+
+    def verify_full(self, header: str, body, max_age_seconds: int = 300) -> tuple:
+        """verify_webhook_full over all secrets and all v1 values; same reason codes."""
+        if not header:
+            return False, "missing_header"
+        parsed = parse_signature_header_all(header)
+        if parsed is None:
+            return False, "invalid_header"
+        ok_ts, _ = verify_timestamp(parsed["t"], max_age_seconds)
+        if not ok_ts:
+            return False, "timestamp_too_old"
+        if self.matching_secret(parsed["t"], body, parsed["v1"]) < 0:
+            return False, "invalid_signature"
+        return True, ""
+
+
+# ---------------------------------------------------------------------------
+# Performance: bounded in-process replay guard
+# ---------------------------------------------------------------------------
+# Example:
+#   guard = ReplayGuard(max_age_seconds=300, shards=4)
+#   guard.check_and_add((ts, body_hash), int(ts)) -> True first time, False on replay
+#   verify_webhook_once(header, body, WebhookVerifier(secret), guard)  -> (False, "replayed") on 2nd delivery
+# Keys live in time buckets of max_age_seconds / buckets seconds, chosen by the latest event timestamp
+# seen for the key (a re-signed retry moves it forward). Once a bucket falls entirely outside the window
+# its keys are dropped in one go: verify_timestamp would reject those messages anyway, so memory is
+# bounded by what one window can hold and every lookup is a dict membership test. Keys are hashed onto
+# shards, each with its own lock.
+# ---------------------------------------------------------------------------
+
+class ReplayGuard:
+    """Remembers replay keys ((timestamp, body hash) pairs or event IDs) for one max_age_seconds window."""
+
+    def __init__(self, max_age_seconds: int = 300, buckets: int = 8, shards: int = 1, clock=time.time):
+        if max_age_seconds <= 0 or buckets <= 0 or shards <= 0:
+            raise ValueError("max_age_seconds, buckets and shards must be positive")
+        self.max_age_seconds = max_age_seconds
+        self._width = max(1, -(-max_age_seconds // buckets))
+        self._clock = clock
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._seen = [{} for _ in range(shards)]     # key -> bucket of the latest timestamp seen for it
+        self._buckets = [{} for _ in range(shards)]  # bucket id -> keys filed there (may hold stale entries)
+        self._cutoff = [None] * shards
+
+    def check_and_add(self, key, timestamp: int) -> bool:
+        """
+        Record key under its event timestamp. Return True if it is new, False if it was already seen
+        or the timestamp is outside the window (such a message cannot pass verify_timestamp).
+        A repeat with a newer timestamp (e.g. a re-signed retry) extends how long the key is kept.
+        """
+        now = int(self._clock())
+        if now - timestamp > self.max_age_seconds:
+            return False
+        i = hash(key) % len(self._locks)
+        with self._locks[i]:
+            self._expire(i, now)
+            seen = self._seen[i]
+            bucket = timestamp // self._width
+            previous = seen.get(key)
+            if previous is None or bucket > previous:
+                seen[key] = bucket
+                self._buckets[i].setdefault(bucket, []).append(key)
+            return previous is None
+
+    def discard(self, key) -> None:
+        """Forget key (e.g. the message it guarded was not processed after all, so a retry must pass)."""
+        i = hash(key) % len(self._locks)
+        with self._locks[i]:
+            self._seen[i].pop(key, None)
+
+    def __contains__(self, key) -> bool:
+        i = hash(key) % len(self._locks)
+        with self._locks[i]:
+            self._expire(i, int(self._clock()))
+            return key in self._seen[i]
+
+    def __len__(self) -> int:
+        total = 0
+        for i, lock in enumerate(self._locks):
+            with lock:
+                self._expire(i, int(self._clock()))
+                total += len(self._seen[i])
+        return total
+
+    def _expire(self, i: int, now: int):
+        """Drop shard i's buckets that end before now - max_age_seconds. Caller holds the lock."""
+        cutoff = (now - self.max_age_seconds) // self._width
+        if cutoff == self._cutoff[i]:
+            return
+        self._cutoff[i] = cutoff
+        buckets, seen = self._buckets[i], self._seen[i]
+        for bucket in [b for b in buckets if b < cutoff]:
+            for key in buckets.pop(bucket):
+                if seen.get(key) == bucket:  # skip entries superseded by a newer timestamp or discarded
+                    del seen[key]
+
+
+def verify_webhook_once(header: str, body, verifier, guard: ReplayGuard, event_id=None) -> tuple:
+    """
+    verifier.verify_full(header, body) plus replay protection: (False, "replayed") for a repeat.
+    The key is event_id if given, else (timestamp, sha256 of body). Only verified messages are recorded.
+    """
+    ok, reason = verifier.verify_full(header, body, guard.max_age_seconds)
+    if not ok:
+        return ok, reason
+    timestamp = parse_signature_header(header)["t"]
+    key = event_id if event_id is not None else _replay_key(timestamp, body)
+    if not guard.check_and_add(key, int(timestamp)):
+        return False, "replayed"
+    return True, ""
+
+
+def _replay_key(timestamp: str, body) -> tuple:
+    """(timestamp, sha256(body)): fixed by the signed content, so extra or reordered v1 values in the header
+    cannot mint a fresh key for a captured message."""
+    return timestamp, hashlib.sha256(_as_bytes(body)).digest()
+
+
+# ---------------------------------------------------------------------------
+# Performance: asyncio webhook receiver with backpressure
+# ---------------------------------------------------------------------------
+# Example:
+#   server = WebhookServer(secret, {"charge.succeeded": on_charge, "invoice.*": on_invoice})
+#   host, port = await server.start("127.0.0.1", 0)
+#   POST / with Stripe-Signature -> 202 accepted | 400/401 <verify_webhook_full reason>
+#                                   | 413 body_too_large | 422 event_type_not_allowed | 503 overloaded
+#   await run_webhook_load(host, port, secret, requests=10_000, concurrency=64)
+#   -> {"requests": 10000, "rps": ..., "p50_ms": ..., "p99_ms": ..., "status": {202: 10000}}
+# Bodies are read only after Content-Length is checked against max_body_bytes. Verification uses a
+# pre-keyed WebhookVerifier (same reasons as verify_webhook_full); bodies of offload_bytes or more are
+# verified and JSON-decoded on an executor so HMAC work does not stall the event loop. Accepted events
+# go through verify_webhook_and_event_type against a route table compiled at startup, then into a
+# bounded queue drained by worker tasks: when handlers fall behind, requests wait up to
+# enqueue_timeout and then get 503, so the sender retries instead of the receiver buffering forever.
+# ---------------------------------------------------------------------------
+
+_HTTP_STATUS = {
+    202: "Accepted", 400: "Bad Request", 401: "Unauthorized", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 422: "Unprocessable Entity",
+    431: "Request Header Fields Too Large", 503: "Service Unavailable",
+}
+_REASON_STATUS = {
+    "missing_header": 400, "invalid_header": 400, "invalid_json": 400,
+    "timestamp_too_old": 401, "invalid_signature": 401, "replayed": 401,
+    "event_type_not_allowed": 422, "overloaded": 503,
+}
+_MAX_ROUTE_CACHE = 4096
+
+
+class _RouteTable:
+    """Event type -> (handler, is_async). Exact types plus "prefix.*" patterns (longest prefix wins)."""
+
+    def __init__(self, routes: dict):
+        self._exact = {}
+        self._prefixes = []
+        for pattern, handler in routes.items():
+            entry = (handler, inspect.iscoroutinefunction(handler))
+            if pattern.endswith("*"):
+                self._prefixes.append((pattern[:-1], entry))
+            else:
+                self._exact[pattern] = entry
+        self._prefixes.sort(key=lambda item: -len(item[0]))
+
+    def get(self, event_type):
+        if not isinstance(event_type, str):
+            return None
+        entry = self._exact.get(event_type)
+        if entry is None:
+            for prefix, candidate in self._prefixes:
+                if event_type.startswith(prefix):
+                    entry = candidate
+                    if len(self._exact) < _MAX_ROUTE_CACHE:
+                        self._exact[event_type] = entry  # resolve each wildcard match once
+                    break
+        return entry
+
+    def __contains__(self, event_type) -> bool:
+        return self.get(event_type) is not None
+
+
+class WebhookServer:
+    """Minimal HTTP/1.1 (keep-alive) webhook receiver: verify, route by event type, hand off to workers."""
+
+    def __init__(self, secret, routes: dict, max_body_bytes: int = 1024 * 1024, offload_bytes: int = 64 * 1024,
+                 queue_size: int = 1024, workers: int = 4, enqueue_timeout: float = 1.0,
+                 max_age_seconds: int = 300, replay_guard: ReplayGuard = None, executor=None):
+        self._verifier = WebhookVerifier(secret)
+        self._routes = _RouteTable(routes)
+        self.max_body_bytes = max_body_bytes
+        self.offload_bytes = offload_bytes
+        self.enqueue_timeout = enqueue_timeout
+        self.max_age_seconds = max_age_seconds
+        if replay_guard is not None and replay_guard.max_age_seconds < max_age_seconds:
+            raise ValueError("replay_guard must remember keys for at least max_age_seconds")
+        self._guard = replay_guard
+        self._queue_size = queue_size
+        self._workers = workers
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._queue = None
+        self._tasks = []
+        self._server = None
+        self.stats = {}
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> tuple:
+        """Start listening and the worker tasks; return the bound (host, port)."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor()
+        self._queue = asyncio.Queue(self._queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._workers)]
+        self._server = await asyncio.start_server(self._handle_connection, host, port, limit=64 * 1024)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        """Stop accepting connections, let the workers drain the queue, then stop them."""
+        self._server.close()
+        await self._server.wait_closed()
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _count(self, reason: str):
+        self.stats[reason] = self.stats.get(reason, 0) + 1
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 431, "headers_too_large", close=True)
+                    break
+                request_line, *lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in lines:
+                    if line:
+                        name, _, value = line.partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                if not request_line.startswith("POST "):
+                    await self._respond(writer, 405, "method_not_allowed", close=True)
+                    break
+                try:
+                    length = int(headers["content-length"])
+                except (KeyError, ValueError):
+                    await self._respond(writer, 411, "length_required", close=True)
+                    break
+                if length < 0 or length > self.max_body_bytes:
+                    self._count("body_too_large")
+                    await self._respond(writer, 413, "body_too_large", close=True)
+                    break
+                body = await reader.readexactly(length)
+                reason = await self._process(headers.get("stripe-signature", ""), body)
+                await self._respond(writer, _REASON_STATUS.get(reason, 202), reason or "accepted", close=not keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _process(self, header: str, body: bytes) -> str:
+        """Verify, decode, route and enqueue one webhook; return "" if accepted, else the reason."""
+        if len(body) >= self.offload_bytes:
+            loop = asyncio.get_running_loop()
+            reason, event = await loop.run_in_executor(self._executor, self._verify_and_decode, header, body)
+        else:
+            reason, event = self._verify_and_decode(header, body)
+        if not reason:
+            _, reason = verify_webhook_and_event_type(event, self._routes)
+        key = None
+        if not reason and self._guard is not None:
+            # Recorded only once the event is about to be queued, and forgotten again if it is shed,
+            # so a 4xx/503 never turns the sender's retry into "replayed".
+            key = _replay_key(parse_signature_header(header)["t"], body)
+            if not self._guard.check_and_add(key, int(key[0])):
+                reason = "replayed"
+        if not reason:
+            try:
+                await asyncio.wait_for(self._queue.put(event), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                reason = "overloaded"
+                if key is not None:
+                    self._guard.discard(key)
+        self._count(reason or "accepted")
+        return reason
+
+    def _verify_and_decode(self, header: str, body: bytes) -> tuple:
+        try:
+            ok, reason = self._verifier.verify_full(header, body, self.max_age_seconds)
+        except (TypeError, ValueError):  # malformed header values must get a response, not kill the connection
+            return "invalid_header", None
+        if not ok:
+            return reason, None
+        try:
+            event = json.loads(body)
+        except ValueError:
+            return "invalid_json", None
+        if not isinstance(event, dict):
+            return "invalid_json", None
+        return "", event
+
+    async def _worker(self):
+        while True:
+            event = await self._queue.get()
+            try:
+                handler, is_async = self._routes.get(event.get("type"))
+                result = handler(event)
+                if is_async:
+                    await result
+            except Exception:
+                self._count("handler_error")
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    async def _respond(writer, status: int, text: str, close: bool = False):
+        payload = text.encode("utf-8")
+        head = f"HTTP/1.1 {status} {_HTTP_STATUS[status]}\r\nContent-Type: text/plain\r\nContent-Length: {len(payload)}\r\n"
+        if close:
+            head += "Connection: close\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + payload)
+        await writer.drain()
+
+
+async def _read_response(reader) -> tuple:
+    """Read one HTTP response; return (status, body bytes)."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return int(lines[0].split(" ", 2)[1]), await reader.readexactly(length)
+
+
+def _webhook_request(header: str, body: bytes, close: bool = False) -> bytes:
+    head = f"POST / HTTP/1.1\r\nHost: localhost\r\nStripe-Signature: {header}\r\nContent-Length: {len(body)}\r\n"
+    if close:
+        head += "Connection: close\r\n"
+    return head.encode("latin-1") + b"\r\n" + body
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+async def run_webhook_load(host: str, port: int, secret, requests: int = 10_000, concurrency: int = 64,
+                           body_size: int = 512, event_type: str = "charge.succeeded") -> dict:
+    """
+    Local load generator: concurrency keep-alive connections send signed webhooks until requests are done.
+    Return {"requests", "seconds", "rps", "p50_ms", "p99_ms", "status": {code: count}}.
+    """
+    body = json.dumps({"type": event_type, "id": "evt_load", "pad": ""}).encode("utf-8")
+    body = body[:-2] + b"x" * max(0, body_size - len(body)) + body[-2:]
+    timestamp = str(int(time.time()))
+    request = _webhook_request(f"t={timestamp},v1={WebhookVerifier(secret).signature(timestamp, body)}", body)
+    latencies = []
+    statuses = {}
+    remaining = [requests]
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                start = time.perf_counter()
+                writer.write(request)
+                await writer.drain()
+                status, _ = await _read_response(reader)
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies), "seconds": elapsed, "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000, "p99_ms": _percentile(latencies, 99) * 1000,
+        "status": statuses,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Performance: streaming verification for large bodies
+# ---------------------------------------------------------------------------
+# Example:
+#   with open("payload.json", "rb") as f:
+#       ok, reason, body = verify_webhook_stream(header, f, WebhookVerifier(secret))
+#   # body: SpooledTemporaryFile rewound to 0 (in memory up to spool_bytes, then on disk); caller closes it
+#   ok, reason, body = await verify_webhook_stream_async(header, reader, verifier, length=content_length)
+#   check = StreamingVerification(verifier, header); check.feed(chunk) ...; check.finish() -> (ok, reason)
+# The header and timestamp are checked before any body byte is read. Chunks are fed to the keyed HMAC
+# as they arrive and written to a sink (the spool by default, or any object with write() to forward
+# them), so peak memory is chunk_size + spool_bytes whatever the body size. The digest is compared
+# with hmac.compare_digest once the stream ends. Reasons are those of verify_webhook_full, plus
+# "body_too_large" when max_body_bytes is exceeded.
+# ---------------------------------------------------------------------------
+
+_STREAM_CHUNK_BYTES = 64 * 1024
+_SPOOL_BYTES = 1024 * 1024
+
+
+class StreamingVerification:
+    """One in-flight streamed verification: check the header, feed() body chunks, then finish()."""
+
+    def __init__(self, verifier: WebhookVerifier, header: str, max_age_seconds: int = 300, sink=None,
+                 spool_bytes: int = _SPOOL_BYTES, max_body_bytes: int = None):
+        self.reason = ""
+        self.body = None
+        self.size = 0
+        self.max_body_bytes = max_body_bytes
+        parsed = parse_signature_header(header) if header else None
+        if not header:
+            self.reason = "missing_header"
+        elif parsed is None:
+            self.reason = "invalid_header"
+        elif not verify_timestamp(parsed["t"], max_age_seconds)[0]:
+            self.reason = "timestamp_too_old"
+        else:
+            self._mac = verifier.begin(parsed["t"])
+            self._signature = parsed["v1"]
+            self._owns_body = sink is None
+            self.body = tempfile.SpooledTemporaryFile(max_size=spool_bytes) if sink is None else sink
+
+    def feed(self, chunk) -> bool:
+        """Hash and store one chunk; return False once the verification has failed (stop reading)."""
+        if self.reason:
+            return False
+        chunk = _as_bytes(chunk)
+        self.size += len(chunk)
+        if self.max_body_bytes is not None and self.size > self.max_body_bytes:
+            self._fail("body_too_large")
+            return False
+        self._mac.update(chunk)
+        self.body.write(chunk)
+        return True
+
+    def finish(self) -> tuple:
+        """(True, "") or (False, reason). On success an owned spool is rewound for reading."""
+        if not self.reason and not _signatures_match(self._mac.hexdigest(), self._signature):
+            self._fail("invalid_signature")
+        if self.reason:
+            return False, self.reason
+        if self._owns_body:
+            self.body.seek(0)
+        return True, ""
+
+    def _fail(self, reason: str):
+        self.reason = reason
+        if self._owns_body:
+            self.body.close()
+        self.body = None
+
+
+def verify_webhook_stream(header: str, source, verifier: WebhookVerifier, sink=None, max_age_seconds: int = 300,
+                          chunk_size: int = _STREAM_CHUNK_BYTES, spool_bytes: int = _SPOOL_BYTES,
+                          max_body_bytes: int = None) -> tuple:
+    """
+    Verify a body read from a file-like object (read(n)) or an iterable of chunks.
+    Return (ok, reason, body): body is the sink (or the rewound spool) on success, else None.
+    """
+    check = StreamingVerification(verifier, header, max_age_seconds, sink, spool_bytes, max_body_bytes)
+    if not check.reason:
+        if hasattr(source, "read"):
+            chunks = iter(lambda: source.read(chunk_size) or b"", b"")  # b"" / "" from read() is EOF
+        else:
+            chunks = (chunk for chunk in source if chunk)  # an empty chunk from an iterable is just empty
+        for chunk in chunks:
+            if not check.feed(chunk):
+                break
+    ok, reason = check.finish()
+    return ok, reason, check.body
+
+
+async def verify_webhook_stream_async(header: str, source, verifier: WebhookVerifier, sink=None,
+                                      max_age_seconds: int = 300, length: int = None,
+                                      chunk_size: int = _STREAM_CHUNK_BYTES, spool_bytes: int = _SPOOL_BYTES,
+                                      max_body_bytes: int = None) -> tuple:
+    """
+    verify_webhook_stream for an asyncio.StreamReader (await read(n), at most length bytes if given)
+    or an async iterator of chunks.
+    """
+    check = StreamingVerification(verifier, header, max_age_seconds, sink, spool_bytes, max_body_bytes)
+    if not check.reason:
+        if hasattr(source, "read"):
+            remaining = length
+            while remaining is None or remaining > 0:
+                chunk = await source.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk or not check.feed(chunk):
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+        else:
+            async for chunk in source:
+                if not check.feed(chunk):
+                    break
+    ok, reason = check.finish()
+    return ok, reason, check.body
+
+
 def run_tests():
     # parse_signature_header
     header = "t=1234567890,v1=abc123,v0=old123"
@@ -118,8 +806,354 @@ def run_tests():
     ok3, reason3 = verify_webhook_and_event_type({"type": "unknown"}, {"charge.succeeded"})
     assert ok3 is False and reason3 == "event_type_not_allowed"
 
+    # Pre-keyed verifier
+    verifier = WebhookVerifier(secret)
+    sig = hmac.new(secret.encode("utf-8"), f"{timestamp}.{body}".encode("utf-8"), hashlib.sha256).hexdigest()
+    assert verify_webhook_signature(timestamp, body, sig, secret) is True
+    assert verifier.signature(timestamp, body) == sig
+    body_bytes = body.encode("utf-8")
+    assert verifier.verify(timestamp, body_bytes, sig) is True
+    assert verifier.verify(timestamp, memoryview(body_bytes), sig) is True
+    assert verifier.verify(timestamp, bytearray(body_bytes), sig) is True
+    assert verifier.verify(timestamp, body_bytes + b" ", sig) is False
+    assert verifier.verify(timestamp, body_bytes, sig) is True  # template not mutated by previous calls
+    now = str(int(time.time()))
+    header_now = f"t={now},v1={verifier.signature(now, body_bytes)}"
+    assert verifier.verify_full(header_now, body_bytes) == (True, "")
+    assert verifier.verify_full(header_now, body) == verify_webhook_full(header_now, body, secret)
+    assert verifier.verify_full(header_now, b"tampered") == (False, "invalid_signature")
+    assert verifier.verify_full(f"t={int(time.time()) - 400},v1=x", body_bytes) == (False, "timestamp_too_old")
+    assert verifier.verify_full("junk", body_bytes) == (False, "invalid_header")
+    assert verifier.verify_full("", body_bytes) == (False, "missing_header")
+    assert verifier.verify(timestamp, body_bytes, "\u00e9") is False  # non-ASCII header value: mismatch, not TypeError
+    assert verifier.verify(timestamp, body_bytes, sig.encode("ascii")) is True
+    assert verifier.verify_full(f"t={now},v1=\u00e9", body_bytes) == (False, "invalid_signature")
+
+    # Batch verification
+    other = WebhookVerifier("whsec_other")
+    batch = [
+        (header_now, body_bytes, secret),
+        (header_now, b"tampered", secret),
+        ("", body_bytes, secret),
+        (f"t={now},v1={other.signature(now, b'big' * 10_000)}", b"big" * 10_000, "whsec_other"),
+        (header_now, body, "whsec_wrong"),
+        ("t=abc,v1=x", body, secret),
+    ]
+    expected = [verify_webhook_full(h, b.decode("utf-8") if isinstance(b, bytes) else b, s) for h, b, s in batch]
+    assert expected[0] == (True, "") and expected[3] == (True, "")
+    assert verify_many(batch) == expected
+    assert verify_many(batch, max_workers=1) == expected
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        assert verify_many(batch, executor=pool) == expected
+    assert verify_many([]) == []
+    assert [len(c) for c in _chunk_by_bytes([(None, "", b"x" * n) for n in (5, 5, 20, 1, 1)], 10)] == [2, 1, 2]
+
+    # Multiple signatures + secret rotation
+    assert parse_signature_header_all("t=123,v1=aaa,v1=bbb,v0=old") == {"t": "123", "v1": ["aaa", "bbb"]}
+    assert parse_signature_header_all("t=123,v0=old") is None
+    assert parse_signature_header_all("t=123,junk") is None
+    rotating = RotatingWebhookVerifier(["whsec_new", secret])
+    sig_new = WebhookVerifier("whsec_new").signature(now, body_bytes)
+    sig_old = verifier.signature(now, body_bytes)
+    assert rotating.matching_secret(now, body_bytes, ["nope", sig_old]) == 1
+    assert rotating.matching_secret(now, body, [sig_new]) == 0
+    assert rotating.matching_secret(now, body_bytes, ["nope"]) == -1
+    assert rotating.verify_full(f"t={now},v1=\u00e9\udcff,v1={sig_old}", body_bytes) == (True, "")
+    assert rotating.verify_full(f"t={now},v1=\u00e9", body_bytes) == (False, "invalid_signature")
+    assert rotating.verify_full(f"t={now},v1=bogus,v1={sig_old}", body_bytes) == (True, "")
+    assert rotating.verify_full(f"t={now},v1={sig_new},v0=legacy", memoryview(body_bytes)) == (True, "")
+    assert rotating.verify_full(f"t={now},v1=bogus", body_bytes) == (False, "invalid_signature")
+    assert rotating.verify_full(f"t={now},v0=legacy", body_bytes) == (False, "invalid_header")
+    assert rotating.verify_full(f"t={int(time.time()) - 400},v1={sig_old}", body_bytes) == (False, "timestamp_too_old")
+    assert RotatingWebhookVerifier([secret]).verify_full(header_now, body) == verify_webhook_full(header_now, body, secret)
+
+    # Replay guard
+    clock = [1_000_000]
+    guard = ReplayGuard(max_age_seconds=300, buckets=4, shards=3, clock=lambda: clock[0])
+    assert guard.check_and_add(("999990", "sig"), 999_990) is True
+    assert guard.check_and_add(("999990", "sig"), 999_990) is False
+    assert guard.check_and_add("evt_1", 999_800) is True
+    assert ("999990", "sig") in guard and "evt_1" in guard and len(guard) == 2
+    assert guard.check_and_add("evt_old", 999_699) is False  # outside the window
+    clock[0] += 50
+    assert "evt_1" in guard and guard.check_and_add("evt_1", 999_950) is False
+    clock[0] += 100  # evt_1's first sighting (t=999_800) is 350 s old, but its retry (t=999_950) keeps it
+    assert "evt_1" in guard and ("999990", "sig") in guard and len(guard) == 2
+    clock[0] += 300  # both keys' latest timestamps are now out of the window
+    assert "evt_1" not in guard and len(guard) == 0
+    clock[0] += 10_000
+    assert len(guard) == 0 and all(not b for b in guard._buckets)
+    # A re-signed retry of the same event keeps the key alive for its own window
+    clock[0] = 1400
+    guard = ReplayGuard(max_age_seconds=300, clock=lambda: clock[0])
+    clock[0] = 1000
+    assert guard.check_and_add("evt_1", 1000) is True
+    clock[0] = 1250
+    assert guard.check_and_add("evt_1", 1250) is False
+    clock[0] = 1400  # ts=1000 is out of the window, ts=1250 is not
+    assert guard.check_and_add("evt_1", 1250) is False and "evt_1" in guard
+    clock[0] = 1600
+    assert "evt_1" not in guard and len(guard) == 0
+    # discard + re-add under a newer timestamp: the stale old-bucket entry must not evict it
+    clock[0] = 2000
+    assert guard.check_and_add("evt_2", 2000) is True
+    guard.discard("evt_2")
+    clock[0] = 2200
+    assert guard.check_and_add("evt_2", 2200) is True
+    clock[0] = 2400  # the ts=2000 bucket expires here
+    assert "evt_2" in guard and guard.check_and_add("evt_2", 2200) is False
+    guard = ReplayGuard()
+    assert verify_webhook_once(header_now, body_bytes, verifier, guard) == (True, "")
+    assert verify_webhook_once(header_now, body_bytes, verifier, guard) == (False, "replayed")
+    assert verify_webhook_once(f"t={now},v1=bogus,{header_now[len(f't={now},'):]}", body_bytes, verifier, guard) == (False, "replayed")
+    assert verify_webhook_once(header_now, b"tampered", verifier, guard) == (False, "invalid_signature")
+    assert verify_webhook_once(header_now, body_bytes, verifier, ReplayGuard(), event_id="evt_123") == (True, "")
+    guard = ReplayGuard()
+    header_rot = f"t={now},v1={sig_old}"
+    assert verify_webhook_once(header_rot, body_bytes, rotating, guard) == (True, "")
+    for junk in ("junk1", "junk2", sig_new):  # extra v1 values must not make a replay look new
+        assert verify_webhook_once(f"{header_rot},v1={junk}", body_bytes, rotating, guard) == (False, "replayed")
+        assert verify_webhook_once(f"t={now},v1={junk},{header_rot[len(f't={now},'):]}", body, rotating, guard) == \
+            (False, "replayed")
+    try:
+        ReplayGuard(max_age_seconds=0)
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+    # Asyncio receiver
+    routes = _RouteTable({"charge.succeeded": len, "invoice.*": len, "invoice.paid.*": str})
+    assert "charge.succeeded" in routes and "invoice.created" in routes and "charge.failed" not in routes
+    assert routes.get("invoice.paid.late")[0] is str and routes.get(["not", "hashable"]) is None
+
+    async def server_checks():
+        received = []
+        slow = asyncio.Event()
+
+        async def on_invoice(event):
+            await slow.wait()
+            received.append(event["type"])
+
+        server = WebhookServer(secret, {"charge.succeeded": lambda e: received.append(e["id"]), "invoice.*": on_invoice},
+                               max_body_bytes=4096, offload_bytes=256, queue_size=1, workers=1,
+                               enqueue_timeout=0.05, replay_guard=ReplayGuard())
+        host, port = await server.start()
+
+        def signed(payload):
+            ts = str(int(time.time()))
+            return f"t={ts},v1={verifier.signature(ts, payload)}"
+
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(_webhook_request(header_now, body_bytes))
+        assert await _read_response(reader) == (202, b"accepted")
+        writer.write(_webhook_request(header_now, body_bytes))  # same connection, replayed
+        assert await _read_response(reader) == (401, b"replayed")
+        big = json.dumps({"type": "charge.succeeded", "id": "evt_big", "pad": "x" * 1000}).encode("utf-8")
+        writer.write(_webhook_request(signed(big), big))  # verified on the executor
+        assert await _read_response(reader) == (202, b"accepted")
+        writer.write(_webhook_request(header_now, b"tampered"))
+        assert await _read_response(reader) == (401, b"invalid_signature")
+        writer.write(_webhook_request(f"t={now},v1=\u00e9\u00ff", body_bytes))  # non-ASCII bytes in the header
+        assert await _read_response(reader) == (401, b"invalid_signature")
+        unknown = b'{"type":"charge.failed"}'
+        header_unknown = signed(unknown)
+        for _ in range(2):  # rejected deliveries are not recorded, so a retry gets the same answer
+            writer.write(_webhook_request(header_unknown, unknown))
+            assert await _read_response(reader) == (422, b"event_type_not_allowed")
+        writer.write(_webhook_request(signed(b"[1]"), b"[1]"))
+        assert await _read_response(reader) == (400, b"invalid_json")
+        for i in range(3):  # worker blocks on the first, queue holds one, the third is shed
+            invoice = json.dumps({"type": "invoice.paid", "id": f"evt_inv{i}"}).encode("utf-8")
+            shed = _webhook_request(signed(invoice), invoice)
+            writer.write(shed)
+            assert (await _read_response(reader))[0] == (503 if i == 2 else 202)
+        slow.set()
+        await server._queue.join()
+        writer.write(shed)  # the sender's retry of the shed event is accepted, not "replayed"
+        assert await _read_response(reader) == (202, b"accepted")
+        writer.write(shed)
+        assert await _read_response(reader) == (401, b"replayed")
+        writer.write(_webhook_request("", b"x" * 5000))
+        assert await _read_response(reader) == (413, b"body_too_large")
+        assert await reader.read() == b""  # server closed the connection
+        writer.close()
+        await server.close()
+        assert received == ["evt_123", "evt_big", "invoice.paid", "invoice.paid", "invoice.paid"]
+        assert server.stats["accepted"] == 5 and server.stats["overloaded"] == 1 and server.stats["replayed"] == 2
+
+        # The server's tolerance is used for verification; the guard must cover it
+        server = WebhookServer(secret, {"charge.succeeded": len}, max_age_seconds=600, replay_guard=ReplayGuard(900))
+        host, port = await server.start()
+        reader, writer = await asyncio.open_connection(host, port)
+        older = str(int(time.time()) - 400)
+        writer.write(_webhook_request(f"t={older},v1={verifier.signature(older, body_bytes)}", body_bytes, close=True))
+        assert await _read_response(reader) == (202, b"accepted")
+        writer.close()
+        await server.close()
+        try:
+            WebhookServer(secret, {}, max_age_seconds=600, replay_guard=ReplayGuard(300))
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+
+        server = WebhookServer(secret, {"charge.succeeded": lambda e: None})
+        host, port = await server.start()
+        report = await run_webhook_load(host, port, secret, requests=200, concurrency=8)
+        await server.close()
+        assert report["requests"] == 200 and report["status"] == {202: 200} and report["p99_ms"] >= report["p50_ms"]
+
+    asyncio.run(server_checks())
+
+    # Streaming verification
+    big_body = b'{"type":"charge.succeeded","pad":"' + b"y" * 300_000 + b'"}'
+    header_big = f"t={now},v1={verifier.signature(now, big_body)}"
+    ok, reason, spooled = verify_webhook_stream(header_big, io.BytesIO(big_body), verifier, chunk_size=4096, spool_bytes=1024)
+    assert (ok, reason) == (True, "") and spooled.read() == big_body
+    spooled.close()
+    sink = io.BytesIO()
+    assert verify_webhook_stream(header_now, [body[:10], body_bytes[10:]], verifier, sink=sink) == (True, "", sink)
+    assert sink.getvalue() == body_bytes
+    pieces = [body_bytes[:5], b"", body_bytes[5:9], "", body_bytes[9:]]
+    assert verify_webhook_stream(header_now, iter(pieces), verifier)[:2] == (True, "")
+    assert verify_webhook_stream(header_now, io.StringIO(body), verifier)[:2] == (True, "")
+    assert verify_webhook_stream(header_now, io.BytesIO(b"tampered"), verifier) == (False, "invalid_signature", None)
+    assert verify_webhook_stream(f"t={now},v1=\u00e9", io.BytesIO(body_bytes), verifier) == (False, "invalid_signature", None)
+    assert verify_webhook_stream(header_big, io.BytesIO(big_body), verifier, max_body_bytes=1000)[:2] == (False, "body_too_large")
+    untouched = io.BytesIO(body_bytes)
+    stale = f"t={int(time.time()) - 400},v1=x"
+    assert verify_webhook_stream(stale, untouched, verifier) == (False, "timestamp_too_old", None) and untouched.tell() == 0
+    assert verify_webhook_stream("", untouched, verifier)[:2] == (False, "missing_header")
+    assert verify_webhook_stream("junk", untouched, verifier)[:2] == (False, "invalid_header")
+
+    async def stream_checks():
+        reader = asyncio.StreamReader()
+        reader.feed_data(big_body + b"NEXT REQUEST")
+        reader.feed_eof()
+        ok, reason, spooled = await verify_webhook_stream_async(header_big, reader, verifier, length=len(big_body), chunk_size=5000)
+        assert (ok, reason) == (True, "") and spooled.read() == big_body and await reader.read() == b"NEXT REQUEST"
+
+        async def chunks():
+            for i in range(0, len(body_bytes), 7):
+                yield body_bytes[i:i + 7]
+
+        ok, reason, spooled = await verify_webhook_stream_async(header_now, chunks(), verifier)
+        assert (ok, reason) == (True, "") and spooled.read() == body_bytes
+
+    asyncio.run(stream_checks())
+
     print("All tests passed.")
 
 
+def _time_it(fn, repeat: int = 5) -> float:
+    """Best wall-clock seconds over repeat runs of fn()."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmarks():
+    secret = "whsec_bench"
+    timestamp = str(int(time.time()))
+    verifier = WebhookVerifier(secret)
+
+    # ----- pre-keyed verifier vs verify_webhook_signature, by body size -----
+    for size in (256, 4 * 1024, 64 * 1024, 1024 * 1024, 8 * 1024 * 1024):
+        body_str = "x" * size
+        body_bytes = body_str.encode("utf-8")
+        sig = verifier.signature(timestamp, body_bytes)
+        n = max(5, 20_000_000 // (size + 1024))
+        base_t = _time_it(lambda: [verify_webhook_signature(timestamp, body_str, sig, secret) for _ in range(n)])
+        str_t = _time_it(lambda: [verifier.verify(timestamp, body_str, sig) for _ in range(n)])
+        bytes_t = _time_it(lambda: [verifier.verify(timestamp, body_bytes, sig) for _ in range(n)])
+        print(f"body {size:>9,} B: verify_webhook_signature {n / base_t:>10,.0f}/s  "
+              f"verifier(str) {n / str_t:>10,.0f}/s  verifier(bytes) {n / bytes_t:>10,.0f}/s  "
+              f"speedup {base_t / bytes_t:4.1f}x")
+
+    # ----- verify_many: sequential verify_webhook_full vs thread pool, by body size and threads -----
+    cores = os.cpu_count() or 1
+    for size in (1024, 64 * 1024, 1024 * 1024):
+        body_bytes = b"x" * size
+        header = f"t={timestamp},v1={verifier.signature(timestamp, body_bytes)}"
+        body_str = body_bytes.decode("utf-8")
+        n = max(8, 40_000_000 // (size + 1024))
+        items = [(header, body_bytes, secret)] * n
+        seq_t = _time_it(lambda: [verify_webhook_full(header, body_str, secret) for _ in range(n)], repeat=3)
+        row = f"verify_many body {size:>9,} B x{n:<6}: sequential {n / seq_t:>9,.0f}/s"
+        threads = 1
+        while True:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                t = _time_it(lambda: verify_many(items, executor=pool), repeat=3)
+            row += f"  t={threads} {seq_t / t:4.1f}x"
+            if threads >= cores:
+                break
+            threads = min(threads * 2, cores)
+        print(row)
+
+    # ----- replay guard: lookups/sec and retained keys at a steady event rate -----
+    clock = [0]
+    guard = ReplayGuard(max_age_seconds=300, shards=4, clock=lambda: clock[0])
+    n, per_second = 600_000, 1_000
+
+    def feed():
+        for i in range(n):
+            clock[0] = i // per_second
+            guard.check_and_add(("ts", i), clock[0])
+
+    t = _time_it(feed, repeat=1)
+    print(f"replay guard: {n / t:>10,.0f} check_and_add/s  retained {len(guard):,} keys "
+          f"({per_second:,}/s over a 300 s window)")
+
+    # ----- streaming verification: read-everything verify_webhook_full vs verify_webhook_stream -----
+    for size in (1024 * 1024, 16 * 1024 * 1024, 64 * 1024 * 1024):
+        with tempfile.TemporaryFile() as f:
+            f.write(b"z" * size)
+            f.seek(0)
+            header = f"t={timestamp},v1={verifier.signature(timestamp, f.read())}"
+
+            def buffered():
+                f.seek(0)
+                return verify_webhook_full(header, f.read().decode("utf-8"), secret)
+
+            def streamed():
+                f.seek(0)
+                ok, reason, body = verify_webhook_stream(header, f, verifier)
+                body.close()
+                return ok, reason
+
+            row = f"stream body {size:>11,} B:"
+            for name, fn in (("buffered", buffered), ("streamed", streamed)):
+                assert fn() == (True, "")
+                t = _time_it(fn, repeat=3)
+                tracemalloc.start()
+                fn()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                row += f"  {name} {size / t / 1e6:7.0f} MB/s peak {peak / 1024 / 1024:7.1f} MiB"
+            print(row)
+
+    # ----- asyncio receiver under local load (server and load generator share one event loop) -----
+    async def serve_and_load(body_size, concurrency, requests):
+        server = WebhookServer(secret, {"charge.succeeded": lambda event: None}, max_body_bytes=4 * 1024 * 1024)
+        host, port = await server.start()
+        try:
+            return await run_webhook_load(host, port, secret, requests=requests, concurrency=concurrency,
+                                          body_size=body_size)
+        finally:
+            await server.close()
+
+    for size in (512, 64 * 1024, 1024 * 1024):
+        for concurrency in (1, 16, 64):
+            requests = max(100, 4_000_000 // (size + 4096))
+            report = asyncio.run(serve_and_load(size, concurrency, requests))
+            print(f"server body {size:>9,} B c={concurrency:<3}: {report['rps']:>8,.0f} req/s  "
+                  f"p50 {report['p50_ms']:7.2f} ms  p99 {report['p99_ms']:7.2f} ms  status {report['status']}")
+
+
 if __name__ == "__main__":
-    run_tests()
+    if "--bench" in sys.argv:
+        run_benchmarks()
+    else:
+        run_tests()